@@ -0,0 +1,142 @@
+import hashlib
+import json
+import mmap
+import os
+import struct
+
+import pygame
+
+from atlas import CARD_SHEET, SPRITES, SpriteAtlas
+
+# Baked cache file
+#   header: magic, version, index length
+#   index:  json, source stamps plus key -> (offset, width, height)
+#   blob:   raw RGBA pixels for every surface back to back
+CACHE_PATH = '.cache/assets.bin'
+MAGIC = b'PALC'
+VERSION = 2
+HEADER = struct.Struct('<4sHI')
+
+def source_stamp(path: str):
+    with open(path, 'rb') as f:
+        digest = hashlib.sha1(f.read()).hexdigest()
+    return {'mtime': os.stat(path).st_mtime_ns, 'sha1': digest}
+
+def source_stamps():
+    stamps = {}
+    for path in [CARD_SHEET] + SPRITES:
+        stamps[path] = source_stamp(path)
+    return stamps
+
+def encode_key(key):
+    if isinstance(key, str):
+        return 'sprite:' + key
+    return 'card:%d,%d,%r' % key
+
+def decode_key(name: str):
+    kind, _, rest = name.partition(':')
+    if kind == 'sprite':
+        return rest
+    val, suit, scale = rest.split(',')
+    scale = float(scale)
+    return (int(val), int(suit), int(scale) if scale.is_integer() else scale)
+
+def bake(atlas: SpriteAtlas, path: str = CACHE_PATH, scale: float = None):
+    """Write every scaled face, the back and the sprites as one blob."""
+    if scale is None:
+        scale = atlas.scale
+    atlas.build_all(scale)
+
+    surfaces = []
+    for key, surface in atlas.surfaces.items():
+        if key[2] == scale:
+            surfaces.append((key, surface))
+    for key, surface in atlas.sprites.items():
+        surfaces.append((key, surface))
+
+    entries = {}
+    chunks = []
+    offset = 0
+    for key, surface in surfaces:
+        data = pygame.image.tobytes(surface, 'RGBA')
+        w, h = surface.get_size()
+        entries[encode_key(key)] = (offset, w, h)
+        chunks.append(data)
+        offset += len(data)
+
+    index = json.dumps({
+        'version': VERSION,
+        'scale': scale,
+        'sources': source_stamps(),
+        'entries': entries,
+    }).encode()
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(index)))
+        f.write(index)
+        for data in chunks:
+            f.write(data)
+    os.replace(tmp_path, path)
+
+def read_index(mm):
+    magic, version, index_len = HEADER.unpack_from(mm, 0)
+    if magic != MAGIC or version != VERSION:
+        return None, 0
+    start = HEADER.size
+    index = json.loads(bytes(mm[start:start + index_len]))
+    return index, start + index_len
+
+def load(atlas: SpriteAtlas, path: str = CACHE_PATH, scale: float = None):
+    """Fill the atlas from the baked blob, False if missing or stale."""
+    if scale is None:
+        scale = atlas.scale
+    try:
+        f = open(path, 'rb')
+    except OSError:
+        return False
+
+    with f:
+        if os.fstat(f.fileno()).st_size < HEADER.size:
+            return False
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    try:
+        index, base = read_index(mm)
+        if index is None or index['scale'] != scale:
+            return False
+        try:
+            if index['sources'] != source_stamps():
+                return False
+        except OSError:
+            return False
+
+        view = memoryview(mm)
+        for name, (offset, w, h) in index['entries'].items():
+            start = base + offset
+            raw = pygame.image.frombuffer(view[start:start + w * h * 4], (w, h), 'RGBA')
+            surface = raw.convert_alpha()
+            del raw
+
+            key = decode_key(name)
+            if isinstance(key, str):
+                atlas.sprites[key] = surface
+            else:
+                atlas.surfaces[key] = surface
+        view.release()
+    finally:
+        mm.close()
+    return True
+
+def warm_atlas(atlas: SpriteAtlas, path: str = CACHE_PATH, scale: float = None):
+    """Load the baked cache, or build and bake it on a cold start."""
+    if scale is None:
+        scale = atlas.scale
+    if load(atlas, path, scale):
+        return True
+    try:
+        bake(atlas, path, scale)
+    except OSError:
+        atlas.build_all(scale)
+    return False
@@ -0,0 +1,187 @@
+from collections import OrderedDict
+
+import pygame
+
+from engine import sheet_pos
+
+# Card sheet layout
+CARD_SHEET = 'cards/cards.png'
+CARD_W = 48
+CARD_H = 64
+BACK_POS = (0, 256)
+
+# Default on-screen scale (48x64 -> 144x192), the layout's card size
+SCALE = 3
+CARD_SIZE = (CARD_W * SCALE, CARD_H * SCALE)
+
+# Key used for the card back, faces are keyed by (val, suit, scale)
+BACK = -1
+
+# Loose sprites that are not on the card sheet
+SPRITES = ['sprites/play_button.png', 'sprites/play_down.png']
+
+# Sprite atlas
+class SpriteAtlas():
+    def __init__(self, path: str = CARD_SHEET):
+        self.path = path
+        self.sheet = None
+        self.surfaces = {}
+        self.sprites = {}
+
+        # Sheet pixels to screen pixels when no scale is asked for, may be
+        # fractional once it is set for the display
+        self.scale = SCALE
+
+        self.hits = 0
+        self.misses = 0
+        self.decodes = 0
+
+    def load_sheet(self):
+        if self.sheet is None:
+            self.sheet = pygame.image.load(self.path).convert_alpha()
+            self.decodes += 1
+        return self.sheet
+
+    def slice(self, rect: pygame.Rect, scale: float):
+        surface = pygame.Surface((rect.width, rect.height), pygame.SRCALPHA)
+        surface.blit(self.load_sheet(), (0, 0), rect)
+        if scale != 1:
+            surface = pygame.transform.scale(surface, (round(rect.width * scale), round(rect.height * scale)))
+        return surface
+
+    def get(self, val: int, suit: int, scale: float = None):
+        if scale is None:
+            scale = self.scale
+        key = (val, suit, scale)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.hits += 1
+            return surface
+
+        self.misses += 1
+        if val == BACK:
+            rect = pygame.Rect(BACK_POS[0], BACK_POS[1], CARD_W, CARD_H)
+        else:
+            rect = pygame.Rect(val * CARD_W, suit * CARD_H, CARD_W, CARD_H)
+        surface = self.slice(rect, scale)
+        self.surfaces[key] = surface
+        return surface
+
+    def get_face(self, val: int, suit: int, scale: float = None):
+        """Shared face surface, val and suit are the sheet column and row."""
+        return self.get(val, suit, scale)
+
+    def get_card(self, card: int, scale: float = None):
+        """Face for an engine card id."""
+        val, suit = sheet_pos(card)
+        return self.get(val, suit, scale)
+
+    def get_back(self, scale: float = None):
+        return self.get(BACK, BACK, scale)
+
+    def get_sprite(self, path: str):
+        surface = self.sprites.get(path)
+        if surface is not None:
+            self.hits += 1
+            return surface
+
+        self.misses += 1
+        surface = pygame.image.load(path).convert_alpha()
+        self.decodes += 1
+        self.sprites[path] = surface
+        return surface
+
+    def build_all(self, scale: float = None):
+        for suit in range(4):
+            for val in range(13):
+                self.get(val, suit, scale)
+        self.get_back(scale)
+        for path in SPRITES:
+            self.get_sprite(path)
+
+    def bytes_held(self):
+        total = 0
+        for surface in list(self.surfaces.values()) + list(self.sprites.values()):
+            total += surface.get_pitch() * surface.get_height()
+        if self.sheet is not None:
+            total += self.sheet.get_pitch() * self.sheet.get_height()
+        return total
+
+    def stats(self):
+        return {
+            'decodes': self.decodes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'surfaces': len(self.surfaces) + len(self.sprites),
+            'bytes': self.bytes_held(),
+        }
+
+    def clear(self):
+        self.sheet = None
+        self.surfaces = {}
+        self.sprites = {}
+
+# Rotated faces
+class RotationCache():
+    """
+    Rotated card faces keyed by (card, angle, scale), angles snapped to
+    step degrees. Least recently used faces are dropped once the cache
+    holds more than budget bytes.
+    """
+    def __init__(self, atlas: SpriteAtlas, budget: int = 32 * 1024 * 1024, step: int = 1):
+        self.atlas = atlas
+        self.budget = budget
+        self.step = step
+        self.entries = OrderedDict()
+        self.bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def quantize(self, angle: float):
+        return int(round(angle / self.step)) * self.step
+
+    def get(self, card: int, angle: float, scale: float = None):
+        if scale is None:
+            scale = self.atlas.scale
+        angle = self.quantize(angle)
+        if angle == 0:
+            return self.atlas.get_card(card, scale)
+
+        key = (card, angle, scale)
+        surface = self.entries.get(key)
+        if surface is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return surface
+
+        self.misses += 1
+        surface = pygame.transform.rotate(self.atlas.get_card(card, scale), angle)
+        self.entries[key] = surface
+        self.bytes += surface.get_pitch() * surface.get_height()
+
+        while self.bytes > self.budget and len(self.entries) > 1:
+            _, old = self.entries.popitem(last=False)
+            self.bytes -= old.get_pitch() * old.get_height()
+            self.evictions += 1
+        return surface
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+            'entries': len(self.entries),
+            'bytes': self.bytes,
+        }
+
+    def clear(self):
+        self.entries = OrderedDict()
+        self.bytes = 0
+
+# Shared atlas, surfaces are built lazily once a display mode is set
+atlas = SpriteAtlas()
+rotations = RotationCache(atlas)
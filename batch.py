@@ -0,0 +1,40 @@
+"""Batched rules evaluation with NumPy.
+
+Scores many (hand, pile top) pairs in one call for balance testing. The
+game itself never imports this module, so NumPy stays an optional extra.
+"""
+import numpy as np
+
+from engine import CARD_VALS, EIGHT, SEVEN, TEN, TWO
+
+# Stand-ins that fit in the same arrays as real vals
+MIXED = 0  # hand: empty, or more than one val
+EMPTY = 0  # top: the pile is empty
+
+CARD_VAL_TABLE = np.array(CARD_VALS, dtype=np.int16)
+
+def card_vals(cards) -> np.ndarray:
+    """Vals for an array of engine card ids."""
+    return CARD_VAL_TABLE[np.asarray(cards)]
+
+def evaluate_batch(vals, tops, seven_active=None) -> np.ndarray:
+    """
+    evaluate() over whole arrays. vals is the val every card in each hand
+    shares (MIXED if they don't), tops the pile's top strength (EMPTY for
+    an empty pile) and seven_active whether the next card must be lower,
+    which defaults to tops == 7's val. Returns int8 codes 0, 1, 2, 3 or 5.
+    """
+    vals = np.asarray(vals, dtype=np.int16)
+    tops = np.asarray(tops, dtype=np.int16)
+    if seven_active is None:
+        seven_active = tops == SEVEN
+    else:
+        seven_active = np.asarray(seven_active, dtype=bool)
+
+    ranked = np.where(seven_active, vals <= tops, vals >= tops)
+    codes = np.select(
+        [vals == MIXED, tops == EMPTY, vals == TWO, vals == TEN, vals == EIGHT, vals == SEVEN],
+        [0, 1, 2, 3, 5, 1],
+        default=ranked,
+    )
+    return codes.astype(np.int8)
@@ -0,0 +1,1323 @@
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+# Benchmarks run headless
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+def report(name: str, results: dict):
+    print(f'{name}:')
+    for key, value in results.items():
+        if isinstance(value, float):
+            print(f'  {key}: {value:.3f}')
+        else:
+            print(f'  {key}: {value}')
+
+# Startup
+def startup_child(cache_path: str):
+    start = time.perf_counter()
+    import pygame
+    from assetcache import warm_atlas
+    from atlas import SpriteAtlas
+
+    pygame.init()
+    pygame.display.set_mode((1280, 800))
+    ready = time.perf_counter()
+
+    atlas = SpriteAtlas()
+    warm = warm_atlas(atlas, cache_path)
+    done = time.perf_counter()
+
+    print(json.dumps({
+        'warm': warm,
+        'decodes': atlas.decodes,
+        'assets_ms': (done - ready) * 1000,
+        'total_ms': (done - start) * 1000,
+    }))
+
+def launch(cache_path: str):
+    out = subprocess.run(
+        [sys.executable, __file__, 'startup', '--child', '--cache', cache_path],
+        check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+def bench_startup(args):
+    if args.child:
+        startup_child(args.cache)
+        return
+
+    cold = []
+    warm = []
+    for _ in range(args.runs):
+        if os.path.exists(args.cache):
+            os.remove(args.cache)
+        cold.append(launch(args.cache))
+        warm.append(launch(args.cache))
+
+    def best(runs, key):
+        return min(run[key] for run in runs)
+
+    report('startup', {
+        'runs': args.runs,
+        'cold_decodes': cold[0]['decodes'],
+        'warm_decodes': warm[0]['decodes'],
+        'warm_hit': all(run['warm'] for run in warm),
+        'cold_assets_ms': best(cold, 'assets_ms'),
+        'warm_assets_ms': best(warm, 'assets_ms'),
+        'cold_total_ms': best(cold, 'total_ms'),
+        'warm_total_ms': best(warm, 'total_ms'),
+    })
+
+# Engine
+def bench_engine(args):
+    import engine
+
+    rng = random.Random(args.seed)
+    state_bytes = engine.new_game(args.players, rng, decks=args.decks).nbytes()
+    turns = 0
+    wins = 0
+    start = time.perf_counter()
+    for _ in range(args.games):
+        state = engine.new_game(args.players, rng, decks=args.decks)
+        if engine.play_random(state, rng) is not None:
+            wins += 1
+        turns += state.turns
+    elapsed = time.perf_counter() - start
+
+    report('engine', {
+        'games': args.games,
+        'finished': wins,
+        'turns': turns,
+        'seconds': elapsed,
+        'turns_per_minute': turns / elapsed * 60,
+        'state_bytes': state_bytes,
+    })
+
+# Move generation
+def legacy_legal_moves(state):
+    # The group-by-val generator legal_moves used to be
+    import engine
+
+    zone = engine.active_zone(state)
+    cards = state.players[state.turn].zone(zone)
+    top = state.top()
+    if zone == engine.UNDER:
+        return [engine.Move(engine.PLAY, engine.UNDER, (card,)) for card in cards]
+    by_val = {}
+    for card in cards:
+        by_val.setdefault(engine.CARD_VALS[card], []).append(card)
+    moves = []
+    for val, group in by_val.items():
+        if engine.evaluate([val], top) == 0:
+            continue
+        if zone == engine.OVER:
+            moves.append(engine.Move(engine.PLAY, engine.OVER, (group[0],)))
+            continue
+        for n in range(1, len(group) + 1):
+            moves.append(engine.Move(engine.PLAY, engine.HAND, tuple(group[:n])))
+    if not moves and state.pile:
+        moves.append(engine.Move(engine.PICKUP))
+    return moves
+
+def move_signature(move) -> tuple:
+    """A move as (kind, zone, rank, count), blind underhand plays keep their card."""
+    import engine
+
+    if move.zone == engine.UNDER and move.cards:
+        return move.kind, move.zone, move.cards[0], 1
+    if move.cards:
+        return move.kind, move.zone, move.cards[0] >> 2, len(move.cards)
+    return move.kind, move.zone, move.rank, move.count
+
+def bench_moves(args):
+    import engine
+
+    # Positions from random self-play, big post-pickup hands included
+    rng = random.Random(args.seed)
+    states = []
+    while len(states) < args.states:
+        state = engine.new_game(args.players, rng)
+        while state.winner is None and state.turns < 2000 and len(states) < args.states:
+            states.append(state.copy())
+            moves = engine.legal_moves(state)
+            if not moves:
+                break
+            engine.apply_move(state, rng.choice(moves))
+
+    # Both generators must offer the same moves everywhere
+    mismatches = 0
+    for state in states:
+        legacy = sorted(map(move_signature, legacy_legal_moves(state)))
+        if legacy != sorted(map(move_signature, engine.legal_moves(state))):
+            mismatches += 1
+
+    results = {'states': len(states), 'mismatches': mismatches,
+               'mean_hand': sum(len(s.players[s.turn].hand) for s in states) / len(states)}
+    for name, generate in (('legacy', legacy_legal_moves), ('bitboard', engine.legal_moves)):
+        moves = 0
+        start = time.perf_counter()
+        for state in states:
+            moves += len(generate(state))
+        elapsed = time.perf_counter() - start
+        results[f'{name}_positions_per_second'] = len(states) / elapsed
+        results[f'{name}_moves_per_second'] = moves / elapsed
+
+    start = time.perf_counter()
+    for state in states:
+        engine.can_play(state)
+    results['can_play_per_second'] = len(states) / (time.perf_counter() - start)
+
+    report('moves', results)
+    if mismatches:
+        sys.exit(1)
+
+# MCTS
+def bench_mcts(args):
+    import engine
+    from bots import greedy_move
+    from mcts import MCTSPlayer
+
+    results = {'games': args.games, 'workers': args.workers}
+    # A fixed number of rollouts a move plays the same games on any machine
+    budgets = [0] if args.iterations else args.budgets
+    for budget in budgets:
+        label = f'{args.iterations}it' if args.iterations else f'{budget}ms'
+        player = MCTSPlayer(budget, args.workers, args.seed, args.iterations)
+        rng = random.Random(args.seed)
+        wins = 0
+        tree = 0
+        for game in range(args.games):
+            state = engine.new_game(2, random.Random(args.seed + game))
+            seat = game % 2
+            while state.winner is None and state.turns < 2000:
+                if state.turn == seat:
+                    engine.apply_move(state, player.choose(state))
+                    tree = max(tree, player.last.get('tree_size', 0))
+                else:
+                    engine.apply_move(state, greedy_move(state, rng))
+            wins += state.winner == seat
+        player.close()
+
+        stats = player.stats()
+        results[f'{label}_win_rate_vs_greedy'] = wins / args.games
+        results[f'{label}_ms_per_move'] = stats['ms_per_move']
+        results[f'{label}_rollouts_per_second'] = stats['rollouts_per_second']
+        results[f'{label}_rollouts_per_move'] = stats['rollouts_per_move']
+        results[f'{label}_max_tree_size'] = tree
+
+    report('mcts', results)
+
+# Endgame
+def small_endgames(seed: int, count: int) -> list:
+    """Face-down deals of one or two cards a zone over a short pile, small enough to solve whole."""
+    import engine
+
+    rng = random.Random(seed)
+    states = []
+    while len(states) < count:
+        deck = engine.new_deck()
+        rng.shuffle(deck)
+        players = [engine.PlayerState((), [deck.pop() for _ in range(rng.randint(1, 2))],
+                                      [deck.pop() for _ in range(rng.randint(1, 2))]) for _ in range(2)]
+        state = engine.GameState((), players)
+        # Plain cards only, so the top card's val is the strength
+        plain = [card for card in deck if engine.card_val(card) not in (engine.TWO, engine.EIGHT, engine.TEN)]
+        state.pile.extend(plain[:rng.randint(0, 3)])
+        state.strength = engine.card_val(state.pile[-1]) if state.pile else 0
+        state.turn = rng.randrange(2)
+        states.append(state)
+    return states
+
+def endgame_walk(solver, seed: int, games: int):
+    """
+    (moves checked, mismatches) playing random endgames, where after every
+    move the solver's incremental make must give the counts, pile top and
+    Zobrist key a fresh load of the engine's state gives, and unmake must
+    put everything back.
+    """
+    import engine
+
+    rng = random.Random(seed)
+    checked = mismatches = 0
+    for game in range(games):
+        state = engine.new_game(2, random.Random(seed + game))
+        while state.winner is None and state.deck:
+            engine.apply_move(state, rng.choice(engine.legal_moves(state)))
+        while state.winner is None and state.turns < 3000:
+            solver.load(state)
+            before = (solver.key, bytes(solver.counts), list(solver.totals), solver.strength, solver.top_val, solver.run, solver.turn)
+            move = rng.choice(engine.legal_moves(state))
+            after = state.copy()
+            engine.apply_move(after, move)
+            if move.kind == engine.PICKUP:
+                undo, won = solver.make_pickup(), False
+            else:
+                rank = move.cards[0] >> 2 if move.cards else move.rank
+                undo, won = solver.make(move.zone, rank, move.count or 1)
+            made = (solver.key, bytes(solver.counts), solver.strength, solver.top_val, solver.run, solver.turn)
+            solver.unmake(undo)
+            ok = before == (solver.key, bytes(solver.counts), list(solver.totals), solver.strength, solver.top_val, solver.run, solver.turn)
+            if won:
+                ok = ok and after.winner == state.turn
+            else:
+                solver.load(after)
+                ok = ok and after.winner is None and made == (solver.key, bytes(solver.counts), solver.strength,
+                                                              solver.top_val, solver.run, solver.turn)
+            checked += 1
+            mismatches += not ok
+            state = after
+    return checked, int(mismatches)
+
+def bench_endgame(args):
+    import engine
+    from bots import greedy_move
+    from endgame import EndgameSolver, is_face_down
+
+    # Face-down decisions from greedy self-play, every one in a game so the
+    # late, small positions are in there as well as the first 6 + 6 ones
+    rng = random.Random(args.seed)
+    states = []
+    game = 0
+    while len(states) < args.positions:
+        state = engine.new_game(2, random.Random(args.seed + game))
+        game += 1
+        while state.winner is None and state.turns < 2000 and len(states) < args.positions:
+            if is_face_down(state):
+                moves = engine.legal_moves(state)
+                if len(moves) > 1 and moves[0].zone != engine.UNDER:
+                    states.append(state.copy())
+            engine.apply_move(state, greedy_move(state, rng))
+
+    # choose() must stay inside the budget MCTSPlayer hands it, and only
+    # answers when every deal solved exactly, anything else goes back to MCTS
+    solver = EndgameSolver(args.memory_mb * 2 ** 20)
+    solved = over_budget = 0
+    slowest = 0.0
+    start = time.perf_counter()
+    for state in states:
+        began = time.perf_counter()
+        move = solver.choose(state, rng, max_nodes=args.max_nodes, budget_ms=args.budget_ms)
+        ms = (time.perf_counter() - began) * 1000
+        solved += move is not None
+        over_budget += ms > args.budget_ms + args.slack_ms
+        slowest = max(slowest, ms)
+    elapsed = time.perf_counter() - start
+
+    results = {'positions': len(states), 'solved': solved, 'to_mcts': len(states) - solved,
+               'budget_ms': args.budget_ms, 'ms_per_position': elapsed * 1000 / len(states),
+               'max_ms': slowest, 'over_budget': over_budget, 'graph_nodes': solver.graph_nodes}
+    results.update(solver.stats())
+
+    # Small endgames must come back exact, and agree with the deepening
+    # search wherever that finishes exact too
+    check = EndgameSolver(args.memory_mb * 2 ** 20)
+    inexact = disagree = compared = 0
+    for state in small_endgames(args.seed, args.small):
+        result = check.move_values(state, args.max_nodes)
+        if not result or not result[1]:
+            inexact += 1
+            continue
+        deep = check.move_values(state, args.max_nodes, graph=False)
+        if deep and deep[1]:
+            compared += 1
+            disagree += any(abs(a[1] - b[1]) > 1e-9 for a, b in zip(result[0], deep[0]))
+    walked, walk_mismatches = endgame_walk(check, args.seed, args.walk_games)
+    results.update({'small': args.small, 'small_inexact': inexact, 'small_compared': compared,
+                    'small_disagree': disagree, 'walk_moves': walked, 'walk_mismatches': walk_mismatches})
+    report('endgame', results)
+    if not solved or over_budget or inexact or disagree or walk_mismatches:
+        sys.exit(1)
+
+# Vector env
+def mirror_game(env, i: int):
+    """An engine.GameState holding game i of env, suits made up for its rank counts."""
+    import engine
+
+    used = [0] * engine.RANKS
+
+    def cards(ranks):
+        out = []
+        for rank in ranks:
+            out.append(rank * 4 + used[rank] % 4)
+            used[rank] += 1
+        return out
+
+    def zone(counts):
+        return cards([rank for rank in range(engine.RANKS) for _ in range(counts[rank])])
+
+    deck = cards(env.deck[i, :env.deck_size[i]].tolist())
+    players = [engine.PlayerState(zone(env.hand[i, p]), zone(env.over[i, p]), zone(env.under[i, p]))
+               for p in range(env.players)]
+    state = engine.GameState(deck, players, env.min_hand_size)
+    state.turn = int(env.turn[i])
+    return state
+
+def same_game(env, i: int, state) -> bool:
+    import engine
+
+    def counts(cards):
+        out = [0] * engine.RANKS
+        for card in cards:
+            out[card >> 2] += 1
+        return out
+
+    for p, player in enumerate(state.players):
+        if (counts(player.hand) != env.hand[i, p].tolist() or counts(player.over) != env.over[i, p].tolist()
+                or counts(player.under) != env.under[i, p].tolist()):
+            return False
+    return (counts(state.pile) == env.pile[i].tolist() and len(state.deck) == env.deck_size[i]
+            and state.turn == env.turn[i] and (not state.pile or state.strength == env.strength[i]))
+
+def engine_mask(env, state):
+    """The action mask engine.legal_moves gives for state."""
+    import engine
+    import numpy as np
+
+    mask = np.zeros(env.action_size, dtype=bool)
+    for move in engine.legal_moves(state):
+        if move.kind == engine.PICKUP:
+            mask[env.PICKUP] = True
+        elif move.zone == engine.UNDER:
+            mask[env.BLIND] = True
+        else:
+            mask[move.rank * env.copies + move.count - 1] = True
+    return mask
+
+def vecenv_check(envs: int, players: int, steps: int, seed: int):
+    """
+    (moves checked, mismatches) mirroring every game of a vector env in
+    the engine. Before each step the env's action mask must equal what
+    engine.legal_moves offers, and after it the engine, given the same
+    move, must hold the same counts, pile, deck and turn.
+    """
+    import engine
+    import numpy as np
+    from vecenv import PalaceVecEnv
+
+    env = PalaceVecEnv(envs, players, seed=seed, max_turns=2 ** 30)
+    env.reset()
+    states = [mirror_game(env, i) for i in range(envs)]
+    rng = np.random.default_rng(seed)
+    checked = mismatches = 0
+    for _ in range(steps):
+        masks = env.action_masks()
+        for i, state in enumerate(states):
+            if not (engine_mask(env, state) == masks[i]).all():
+                mismatches += 1
+        actions = env.sample_actions(masks)
+        # Some illegal actions too, they must leave the game as it was
+        wild = rng.random(envs) < 0.05
+        actions[wild] = rng.integers(0, env.action_size, wild.sum())
+        under = env.under.copy()
+        turn = env.turn.copy()
+        _, rewards, dones, info = env.step(actions)
+        for i, state in enumerate(states):
+            action = int(actions[i])
+            checked += 1
+            if info['illegal'][i]:
+                mismatches += not same_game(env, i, state)
+                continue
+            if action == env.PICKUP:
+                move = engine.Move(engine.PICKUP)
+            elif action == env.BLIND:
+                # The rank that left the underhand, the only one left if it went out
+                left = under[i, turn[i]] - (0 if dones[i] else env.under[i, turn[i]])
+                rank = int(np.nonzero(left)[0][0])
+                card = next(card for card in state.players[state.turn].under if card >> 2 == rank)
+                move = engine.Move(engine.PLAY, engine.UNDER, (card,))
+            else:
+                move = engine.Move(engine.PLAY, engine.active_zone(state), (), action % env.copies + 1, action // env.copies)
+            engine.apply_move(state, move)
+            if dones[i]:
+                mismatches += state.winner != turn[i] or rewards[i] != 1.0
+                states[i] = mirror_game(env, i)
+            elif not same_game(env, i, state):
+                mismatches += 1
+                states[i] = mirror_game(env, i)
+    return checked, int(mismatches)
+
+def bench_vecenv(args):
+    from vecenv import PalaceVecEnv
+
+    results = {}
+    for n in args.envs:
+        env = PalaceVecEnv(n, args.players, seed=args.seed)
+        env.reset()
+        steps = max(args.steps // n, 10)
+        stepping = 0.0
+        sampling = 0.0
+        for _ in range(steps):
+            start = time.perf_counter()
+            actions = env.sample_actions()
+            ready = time.perf_counter()
+            env.step(actions)
+            stepping += time.perf_counter() - ready
+            sampling += ready - start
+        results[f'{n}_envs_steps_per_second'] = n * steps / stepping
+        results[f'{n}_envs_with_sampling_per_second'] = n * steps / (stepping + sampling)
+        results[f'{n}_envs_games'] = env.games - n
+
+    checked, mismatches = vecenv_check(64, args.players, args.check_steps, args.seed)
+    results['checked_moves'] = checked
+    results['mismatches'] = mismatches
+    report('vecenv', results)
+    if mismatches:
+        sys.exit(1)
+
+# Snapshots
+def bench_snapshot(args):
+    import engine
+    import snapshot
+
+    rng = random.Random(args.seed)
+    states = []
+    while len(states) < args.states:
+        state = engine.new_game(args.players, rng)
+        while state.winner is None and state.turns < 2000 and len(states) < args.states:
+            states.append(state.copy())
+            engine.apply_move(state, rng.choice(engine.legal_moves(state)))
+
+    start = time.perf_counter()
+    blobs = [snapshot.pack(state) for state in states]
+    packed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    restored = [snapshot.unpack(blob) for blob in blobs]
+    unpacked = time.perf_counter() - start
+
+    # A restored state packs back to the same bytes and has the same seen cards
+    mismatches = sum(snapshot.pack(state) != blob or [p.known for p in state.players] != [p.known for p in original.players]
+                     for state, blob, original in zip(restored, blobs, states))
+
+    start = time.perf_counter()
+    for state in states:
+        state.copy()
+    copied = time.perf_counter() - start
+
+    n = len(states)
+    report('snapshot', {
+        'states': n,
+        'mean_bytes': sum(len(blob) for blob in blobs) / n,
+        'max_bytes': max(len(blob) for blob in blobs),
+        'state_bytes': sum(state.nbytes() for state in states) / n,
+        'pack_us': packed * 1e6 / n,
+        'unpack_us': unpacked * 1e6 / n,
+        'copy_us': copied * 1e6 / n,
+        'known_cards': sum(len(p.known) for state in states for p in state.players) / n,
+        'mismatches': mismatches,
+    })
+    if mismatches:
+        sys.exit(1)
+
+# Replay
+def bench_replay(args):
+    import engine
+    from bots import greedy_move
+    import snapshot
+    from replay import ActionLog, Replay
+
+    rng = random.Random(args.seed)
+    logs = []
+    for game in range(args.games):
+        state = engine.new_game(2, random.Random(args.seed + game))
+        log = ActionLog(args.seed + game, state)
+        while state.winner is None and state.turns < 2000:
+            log.apply(state, greedy_move(state, rng))
+        logs.append(log)
+
+    moves = sum(len(log) for log in logs)
+    data = [log.to_bytes() for log in logs]
+    start = time.perf_counter()
+    for log in data:
+        Replay(ActionLog.from_bytes(log)).run()
+    elapsed = time.perf_counter() - start
+
+    seeks = 0
+    targets = []
+    seek_start = time.perf_counter()
+    for log in logs:
+        game = Replay(log)
+        positions = [rng.randrange(len(log) + 1) for _ in range(args.seeks)]
+        for position in positions:
+            game.seek(position)
+            seeks += 1
+        targets.append(positions)
+    seek_elapsed = time.perf_counter() - seek_start
+
+    # The same seeks again, every one, through the checkpoints, lands on the
+    # state stepping from the start gives, seen cards and all
+    mismatches = 0
+    for log, positions in zip(logs, targets):
+        game = Replay(log)
+        stepped = [log.start]
+        while game.position < len(log):
+            game.step()
+            stepped.append(snapshot.pack(game.state))
+        game = Replay(log)
+        for position in positions:
+            mismatches += snapshot.pack(game.seek(position)) != stepped[position]
+
+    report('replay', {
+        'games': len(logs),
+        'bytes_per_move': sum(len(log) for log in data) / moves,
+        'moves_per_second': moves / elapsed,
+        'seeks_per_second': seeks / seek_elapsed,
+        'checked_seeks': seeks,
+        'mismatches': mismatches,
+    })
+    if mismatches:
+        sys.exit(1)
+
+# Profiler
+def bench_profiler(args):
+    from profiler import FrameProfiler
+
+    phases = ('wait', 'events', 'rules', 'update_move', 'refill', 'deck', 'hand', 'piles', 'sprites', 'present', 'tick')
+    results = {'frames': args.frames, 'phases': len(phases)}
+    for enabled in (False, True):
+        profiler = FrameProfiler()
+        profiler.enabled = enabled
+        start = time.perf_counter()
+        for _ in range(args.frames):
+            profiler.start()
+            for phase in phases:
+                profiler.mark(phase)
+            profiler.end()
+        elapsed = time.perf_counter() - start
+        results['on_us_per_frame' if enabled else 'off_us_per_frame'] = elapsed * 1e6 / args.frames
+
+    start = time.perf_counter()
+    events = profiler.trace_events()
+    results['trace_events'] = len(events)
+    results['trace_build_ms'] = (time.perf_counter() - start) * 1000
+    report('profiler', results)
+
+# Tournament
+def bench_tournament(args):
+    from tournament import Config, run_tournament
+
+    config = Config(tuple(args.strategies))
+    results = {'games': args.games, 'cpus': os.cpu_count()}
+    base = None
+    for workers in args.workers:
+        start = time.perf_counter()
+        run_tournament(config, args.games, workers, args.batch_size, args.seed)
+        rate = args.games / (time.perf_counter() - start)
+        base = base or rate
+        results[f'workers_{workers}_games_per_second'] = rate
+        results[f'workers_{workers}_speedup'] = rate / base
+
+    report('tournament', results)
+
+# Shuffle
+def legacy_shuffle(cards: list):
+    # The random.choice + list.remove shuffle Deck used to do
+    new_cards = []
+    for _ in range(len(cards)):
+        card = random.choice(cards)
+        cards.remove(card)
+        new_cards.append(card)
+    return new_cards
+
+def bench_shuffle(args):
+    import engine
+
+    rng = random.Random(args.seed)
+    results = {}
+    for decks in args.decks:
+        def legacy():
+            cards = list(range(52)) * decks
+            cards = legacy_shuffle(cards)
+            while cards:
+                cards.remove(cards[0])
+
+        def shoe():
+            cards = engine.new_deck(decks)
+            rng.shuffle(cards)
+            while cards:
+                cards.pop()
+
+        for name, fn in (('legacy', legacy), ('fisher_yates', shoe)):
+            start = time.perf_counter()
+            for _ in range(args.rounds):
+                fn()
+            results[f'{decks * 52}_{name}_us'] = (time.perf_counter() - start) / args.rounds * 1e6
+
+    report('shuffle + draw all', results)
+
+# Batch rules
+def seven_active(pile) -> bool:
+    """Whether the next card must go under a seven, worked out from the pile's cards."""
+    import engine
+
+    # An 8 copies whatever it covers
+    for card in reversed(pile):
+        val = engine.CARD_VALS[card]
+        if val != engine.EIGHT:
+            return val == engine.SEVEN
+    return False
+
+def game_cases(seed: int, games: int):
+    """
+    (hands, tops, sevens) from random self-play: every rank group of the
+    hand to act at every count, plus a mixed pair, against the real pile.
+    """
+    import engine
+
+    rng = random.Random(seed)
+    hands, tops, sevens = [], [], []
+    for game in range(games):
+        state = engine.new_game(2, random.Random(seed + game))
+        while state.winner is None and state.turns < 500:
+            hand = list(state.players[state.turn].hand)
+            groups = {}
+            for card in hand:
+                groups.setdefault(card >> 2, []).append(card)
+            picks = [group[:n] for group in groups.values() for n in range(1, len(group) + 1)]
+            if len(groups) > 1:
+                picks.append(rng.sample(hand, 2))
+            for cards in picks:
+                hands.append(cards)
+                tops.append(state.top())
+                sevens.append(seven_active(state.pile))
+            engine.apply_move(state, rng.choice(engine.legal_moves(state)))
+    return hands, tops, sevens
+
+def bench_batch(args):
+    import numpy as np
+
+    import engine
+    from batch import EMPTY, MIXED, evaluate_batch
+
+    # Every val against every top, mixed hands and empty piles included
+    vals = [MIXED] + engine.VALS
+    tops = [EMPTY] + engine.VALS
+    grid_vals = np.repeat(vals, len(tops))
+    grid_tops = np.tile(tops, len(vals))
+    codes = evaluate_batch(grid_vals, grid_tops)
+    mismatches = 0
+    for val, top, code in zip(grid_vals.tolist(), grid_tops.tolist(), codes.tolist()):
+        hand = [2, 3] if val == MIXED else [val]
+        if engine.evaluate(hand, None if top == EMPTY else top) != code:
+            mismatches += 1
+
+    # Real hands of one or more cards over real piles, with the seven
+    # flag passed in as worked out from the pile rather than the strength
+    hands, piles, sevens = game_cases(args.seed, args.games)
+    hand_vals = [[engine.CARD_VALS[card] for card in cards] for cards in hands]
+    shared = [vals[0] if len(set(vals)) == 1 else MIXED for vals in hand_vals]
+    codes = evaluate_batch(shared, [EMPTY if top is None else top for top in piles], sevens)
+    for vals, top, code in zip(hand_vals, piles, codes.tolist()):
+        if engine.evaluate(vals, top) != code:
+            mismatches += 1
+
+    rng = np.random.default_rng(args.seed)
+    batch_vals = rng.choice(vals, args.size).astype(np.int16)
+    batch_tops = rng.choice(tops, args.size).astype(np.int16)
+
+    start = time.perf_counter()
+    evaluate_batch(batch_vals, batch_tops)
+    batch_seconds = time.perf_counter() - start
+
+    scalar_n = min(args.size, 200000)
+    pairs = list(zip(batch_vals[:scalar_n].tolist(), batch_tops[:scalar_n].tolist()))
+    start = time.perf_counter()
+    for val, top in pairs:
+        engine.evaluate([2, 3] if val == MIXED else [val], None if top == EMPTY else top)
+    scalar_seconds = time.perf_counter() - start
+
+    report('batch', {
+        'grid_cases': len(grid_vals),
+        'game_cases': len(hands),
+        'multi_card_cases': sum(len(cards) > 1 for cards in hands),
+        'seven_cases': sum(sevens),
+        'mismatches': mismatches,
+        'batch_per_second': args.size / batch_seconds,
+        'scalar_per_second': scalar_n / scalar_seconds,
+    })
+    if mismatches:
+        sys.exit(1)
+
+# Frames
+def frame_scene():
+    """Sprites laid out like a mid-game table: deck, hand, over/under and both piles."""
+    import pygame
+
+    from atlas import atlas
+
+    rng = random.Random(1)
+    back = atlas.get_back()
+    faces = [atlas.get_card(card) for card in range(52)]
+
+    items = []
+    for i in range(40):
+        items.append((back, (1100 + int(i * 0.5 / 3), 350 - i * 0.5)))
+    for i in range(8):
+        items.append((faces[i], (475 - 576 + i * 144, 725)))
+    for i in range(3):
+        items.append((back, (950 + i * 150, 725)))
+        items.append((faces[10 + i], (955 + i * 150, 710)))
+    for i in range(12):
+        surface = pygame.transform.rotate(faces[20 + i], rng.randrange(-5, 5))
+        items.append((surface, (600 + int(i / 3), 350 - i * 0.1)))
+        surface = pygame.transform.rotate(faces[32 + i], rng.randrange(-25, 25))
+        items.append((surface, (150 + int(i / 3), 350 - i * 0.1)))
+    return items
+
+def scene_frame(items: list, tick: int, animating: bool, faces: list):
+    if not animating:
+        return items
+    moving = []
+    for i, face in enumerate(faces):
+        t = ((tick + i * 4) % 13) / 13
+        moving.append((face, (1100 - 500 * t, 350 + 375 * t)))
+    return items + moving
+
+def time_frames(draw, frames: int):
+    start = time.perf_counter()
+    for tick in range(frames):
+        draw(tick)
+    return (time.perf_counter() - start) / frames * 1000
+
+def bench_frames(args):
+    import pygame
+
+    from atlas import atlas
+    from render import WHITE, Renderer
+
+    pygame.init()
+    screen = pygame.display.set_mode((args.width, args.height))
+    items = frame_scene()
+    faces = [atlas.get_card(card) for card in (44, 45, 46)]
+
+    results = {}
+    for animating in (False, True):
+        label = 'animating' if animating else 'idle'
+
+        def full(tick):
+            buffer = pygame.Surface(screen.get_size())
+            buffer.fill(WHITE)
+            for surface, pos in scene_frame(items, tick, animating, faces):
+                buffer.blit(surface, pos)
+            screen.blit(buffer, (0, 0))
+            pygame.display.flip()
+
+        renderer = Renderer(screen.get_size(), WHITE)
+
+        def retained(tick):
+            for surface, pos in scene_frame(items, tick, animating, faces):
+                renderer.blit(surface, pos)
+            renderer.present(screen)
+
+        results[f'{label}_full_ms'] = time_frames(full, args.frames)
+        results[f'{label}_dirty_ms'] = time_frames(retained, args.frames)
+
+    report(f'frames {args.width}x{args.height}', results)
+
+# Piles
+def bench_piles(args):
+    import pygame
+
+    from atlas import rotations
+    from render import PileComposite
+
+    pygame.init()
+    screen = pygame.display.set_mode((800, 600))
+    rng = random.Random(1)
+
+    results = {}
+    for height in args.heights:
+        cards = [rng.randrange(52) for _ in range(height)]
+        angles = [rng.randrange(-25, 25) for _ in range(height)]
+
+        def layer(i):
+            return rotations.get(cards[i], angles[i])
+
+        def per_card(tick):
+            for i in range(len(cards)):
+                screen.blit(layer(i), (150 + int(i / 3), 350 - i * 0.1))
+
+        composite = PileComposite()
+
+        def flattened(tick):
+            composite.draw(screen, (150, 350), cards, layer)
+
+        results[f'{height}_per_card_ms'] = time_frames(per_card, args.frames)
+        results[f'{height}_composite_ms'] = time_frames(flattened, args.frames)
+
+    report('piles', results)
+
+# Resolution
+def bench_resolution(args):
+    import pygame
+
+    from atlas import SpriteAtlas
+    from layout import VIRTUAL_SIZE, Viewport
+
+    pygame.init()
+    results = {}
+    for size in args.sizes:
+        width, height = (int(n) for n in size.split('x'))
+        screen = pygame.display.set_mode((width, height))
+        viewport = Viewport((width, height))
+
+        start = time.perf_counter()
+        atlas = SpriteAtlas()
+        atlas.build_all(viewport.card_scale())
+        results[f'{size}_atlas_build_ms'] = (time.perf_counter() - start) * 1000
+
+        # The alternative: draw at the virtual size, scale the whole frame
+        table = pygame.Surface(VIRTUAL_SIZE)
+        target = (int(VIRTUAL_SIZE[0] * viewport.scale), int(VIRTUAL_SIZE[1] * viewport.scale))
+
+        def scaled(tick):
+            screen.blit(pygame.transform.scale(table, target), viewport.origin)
+
+        face = atlas.get_card(0)
+        spots = [viewport.to_screen((150 + i * 150, 725)) for i in range(args.cards)]
+
+        def prescaled(tick):
+            for spot in spots:
+                screen.blit(face, spot)
+
+        results[f'{size}_frame_scale_ms'] = time_frames(scaled, args.frames)
+        results[f'{size}_prescaled_cards_ms'] = time_frames(prescaled, args.frames)
+
+    report('resolution', results)
+
+# Group moves
+def bench_groups(args):
+    import pygame
+
+    from atlas import atlas
+    from render import WHITE, Renderer
+    from tween import TweenEngine
+
+    pygame.init()
+    screen = pygame.display.set_mode((1600, 900))
+
+    results = {}
+    for count in args.counts:
+        faces = [atlas.get_card(card % 52) for card in range(count)]
+        destination = Sprite()
+
+        # One tween and one blit per card, all on the same path
+        def per_card():
+            renderer = Renderer(screen.get_size(), WHITE)
+            tweens = TweenEngine()
+            for face in faces:
+                tweens.add(face, destination, (600, 350), (150, 350), 13)
+            frames = 0
+            start = time.perf_counter()
+            while tweens.step() or len(tweens):
+                for face, x, y in zip(tweens.items, tweens.x, tweens.y):
+                    renderer.blit(face, (x, y))
+                renderer.present(screen)
+                frames += 1
+            return (time.perf_counter() - start) / frames * 1000
+
+        # Composited when the move starts, then one tween and one blit
+        def grouped():
+            renderer = Renderer(screen.get_size(), WHITE)
+            tweens = TweenEngine()
+            start = time.perf_counter()
+            surface = pygame.Surface(faces[0].get_size(), pygame.SRCALPHA)
+            for face in faces:
+                surface.blit(face, (0, 0))
+            tweens.add(surface, destination, (600, 350), (150, 350), 13)
+            frames = 0
+            while tweens.step() or len(tweens):
+                for item, x, y in zip(tweens.items, tweens.x, tweens.y):
+                    renderer.blit(item, (x, y))
+                renderer.present(screen)
+                frames += 1
+            return (time.perf_counter() - start) / frames * 1000
+
+        results[f'{count}_per_card_ms'] = per_card()
+        results[f'{count}_group_ms'] = grouped()
+
+    report('groups', results)
+
+# Hand
+def bench_hand(args):
+    import pygame
+
+    from atlas import atlas
+    from layout import hand_positions
+    from render import WHITE, Renderer, strip_surface
+
+    class HandCard():
+        def __init__(self, face: pygame.Surface):
+            self.front_surface = face
+            self.selected = False
+
+    pygame.init()
+    screen = pygame.display.set_mode((1600, 900))
+
+    results = {}
+    for size in args.hands:
+        cards = [HandCard(atlas.get_card(card % 52)) for card in range(size)]
+        positions = hand_positions(size, (475, 725))
+
+        def spots():
+            # As PlayerHand.rest, a selected card is raised 50
+            return [(x, y - 50) if card.selected else (x, y) for card, (x, y) in zip(cards, positions)]
+
+        renderer = Renderer(screen.get_size(), WHITE)
+
+        def per_card(tick):
+            for card, spot in zip(cards, spots()):
+                renderer.blit(card.front_surface, spot)
+            renderer.present(screen)
+
+        # As PlayerHand.draw_hand, a layout key every frame and the strip
+        # rebuilt by the client's strip_surface whenever it changes
+        cached = Renderer(screen.get_size(), WHITE)
+        built = {'key': None}
+
+        def composited(tick):
+            key = tuple(cards), tuple(card for card in cards if card.selected)
+            if key != built['key']:
+                built['strip'], built['pos'] = strip_surface([card.front_surface for card in cards], spots())
+                built['key'] = key
+            cached.blit(built['strip'], built['pos'])
+            cached.present(screen)
+
+        def selecting(draw):
+            # A card selected or dropped every frame
+            def frame(tick):
+                card = cards[tick % size]
+                card.selected = not card.selected
+                draw(tick)
+            return frame
+
+        faces = [card.front_surface for card in cards]
+        start = time.perf_counter()
+        for _ in range(args.frames):
+            strip_surface(faces, spots())
+        rebuild = time.perf_counter() - start
+
+        results[f'{size}_per_card_ms'] = time_frames(per_card, args.frames)
+        results[f'{size}_strip_ms'] = time_frames(composited, args.frames)
+        results[f'{size}_rebuild_ms'] = rebuild / args.frames * 1000
+        results[f'{size}_selecting_per_card_ms'] = time_frames(selecting(per_card), args.frames)
+        results[f'{size}_selecting_strip_ms'] = time_frames(selecting(composited), args.frames)
+
+    report('hand', results)
+
+# Hit testing
+def bench_hittest(args):
+    import pygame
+
+    from hittest import HitIndex
+    from layout import hand_positions
+
+    class HandCard():
+        def __init__(self, pos: tuple):
+            self.x, self.y = pos
+            self.selected = False
+
+        def rect(self):
+            # As palace.hand_card_rect, raised 50 when selected
+            return pygame.Rect(self.x, self.y - 50 if self.selected else self.y, 144, 192)
+
+    rng = random.Random(1)
+    results = {}
+    for size in args.hands:
+        # Laid out by the client's own hand_positions, as PlayerHand.place does
+        cards = [HandCard(pos) for pos in hand_positions(size, (475, 725))]
+        clicks = [(rng.randrange(0, 1000), rng.randrange(650, 950)) for _ in range(args.clicks)]
+
+        start = time.perf_counter()
+        for pos in clicks:
+            for card in reversed(cards):
+                if card.rect().collidepoint(pos):
+                    break
+        scan = time.perf_counter() - start
+
+        # Built as index_cards does, each card's area has room for it raised
+        index = HitIndex()
+        items = [(card, pygame.Rect(card.x, card.y - 50, 144, 242)) for card in cards]
+        start = time.perf_counter()
+        index.build(0, tuple(cards), items, HandCard.rect)
+        built = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for pos in clicks:
+            index.hit(0, pos)
+        indexed = time.perf_counter() - start
+
+        # Every click selects or drops the card under it, the index is keyed
+        # on the cards alone so none of that re-buckets the hand
+        builds = index.builds
+        start = time.perf_counter()
+        for pos in clicks:
+            key = tuple(cards)
+            if index.stale(0, key):
+                index.build(0, key, items, HandCard.rect)
+            card = index.hit(0, pos)
+            if card is not None:
+                card.selected = not card.selected
+        selecting = time.perf_counter() - start
+
+        results[f'{size}_scan_us'] = scan * 1e6 / args.clicks
+        results[f'{size}_index_us'] = indexed * 1e6 / args.clicks
+        results[f'{size}_build_us'] = built * 1e6
+        results[f'{size}_select_us'] = selecting * 1e6 / args.clicks
+        results[f'{size}_select_rebuilds'] = index.builds - builds
+        results[f'{size}_selected'] = sum(card.selected for card in cards)
+
+    report('hittest', results)
+
+# Deck
+def bench_deck(args):
+    import pygame
+
+    from atlas import atlas
+    from render import WHITE, Renderer, stack_surface
+
+    pygame.init()
+    screen = pygame.display.set_mode((1600, 900))
+    back = atlas.get_back()
+
+    results = {}
+    for count in args.counts:
+        renderer = Renderer(screen.get_size(), WHITE)
+
+        def per_card(tick, n: int = count):
+            index = 0
+            for _ in range(n):
+                renderer.blit(back, (1100 + int(index / 3), 350 - index))
+                index += 0.5
+            renderer.present(screen)
+
+        # As Deck.draw_deck, rebuilt by the client's stack_surface whenever
+        # the count changes and one blit otherwise
+        stacked = Renderer(screen.get_size(), WHITE)
+        built = {'count': 0}
+
+        def stack(tick, n: int = count):
+            if n != built['count']:
+                built['surface'], built['top'] = stack_surface(back, n)
+                built['count'] = n
+            stacked.blit(built['surface'], (1100, 350 - built['top']))
+            stacked.present(screen)
+
+        start = time.perf_counter()
+        for _ in range(args.frames):
+            stack_surface(back, count)
+        rebuild = time.perf_counter() - start
+
+        results[f'{count}_per_card_ms'] = time_frames(per_card, args.frames)
+        results[f'{count}_stack_ms'] = time_frames(stack, args.frames)
+        results[f'{count}_rebuild_ms'] = rebuild / args.frames * 1000
+        # A card dealt every frame, so every stack frame rebuilds
+        results[f'{count}_dealing_per_card_ms'] = time_frames(lambda tick: per_card(tick, count - tick % count), args.frames)
+        results[f'{count}_dealing_stack_ms'] = time_frames(lambda tick: stack(tick, count - tick % count), args.frames)
+
+    report('deck', results)
+
+# Tweens
+class Sprite():
+    def __init__(self):
+        self.idle_pos = (0, 0)
+        self.cards = []
+
+def legacy_update(anim_cards: list):
+    # The tuple list AnimationManager.update_move used to step
+    to_remove = []
+    for info in anim_cards:
+        start_pos, end_pos, duration_frames, card, destination, tick = info
+        if tick >= duration_frames:
+            card.idle_pos = end_pos
+            to_remove.append(info)
+            destination.cards.append(card)
+            continue
+        progress = tick / duration_frames
+        new_x = start_pos[0] + (end_pos[0] - start_pos[0]) * progress
+        new_y = start_pos[1] + (end_pos[1] - start_pos[1]) * progress
+        card.idle_pos = (new_x, new_y)
+        tick += 1
+        anim_cards[anim_cards.index(info)] = (start_pos, end_pos, duration_frames, card, destination, tick)
+    for info in to_remove:
+        anim_cards.remove(info)
+
+def bench_tweens(args):
+    from tween import EASE_IN_OUT, TweenEngine
+
+    results = {}
+    for count in args.counts:
+        destination = Sprite()
+        sprites = [Sprite() for _ in range(count)]
+
+        # Staggered durations so tweens finish on different frames
+        def legacy():
+            anim_cards = []
+            for i, sprite in enumerate(sprites):
+                anim_cards.append(((1100, 350), (619, 725), 13 + i % 20, sprite, destination, 0))
+            frames = 0
+            start = time.perf_counter()
+            while anim_cards:
+                legacy_update(anim_cards)
+                frames += 1
+            return (time.perf_counter() - start) / frames * 1000
+
+        def engine(ease):
+            tweens = TweenEngine()
+            for i, sprite in enumerate(sprites):
+                tweens.add(sprite, destination, (1100, 350), (619, 725), 13 + i % 20, ease)
+            frames = 0
+            start = time.perf_counter()
+            while len(tweens):
+                finished = tweens.step()
+                for sprite, x, y in zip(tweens.items, tweens.x, tweens.y):
+                    sprite.idle_pos = (x, y)
+                for sprite, target, end_pos in finished:
+                    sprite.idle_pos = end_pos
+                    target.cards.append(sprite)
+                frames += 1
+            return (time.perf_counter() - start) / frames * 1000
+
+        results[f'{count}_legacy_ms'] = legacy()
+        results[f'{count}_engine_ms'] = engine(0)
+        results[f'{count}_engine_eased_ms'] = engine(EASE_IN_OUT)
+
+    report('tweens (ms per frame)', results)
+
+def main():
+    parser = argparse.ArgumentParser(description='Palace benchmarks')
+    sub = parser.add_subparsers(dest='bench', required=True)
+
+    startup = sub.add_parser('startup', help='cold vs warm asset cache launch')
+    startup.add_argument('--runs', type=int, default=5)
+    startup.add_argument('--cache', default='.cache/bench_assets.bin')
+    startup.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    startup.set_defaults(func=bench_startup)
+
+    eng = sub.add_parser('engine', help='headless random self-play throughput')
+    eng.add_argument('--games', type=int, default=2000)
+    eng.add_argument('--players', type=int, default=2)
+    eng.add_argument('--decks', type=int, default=1)
+    eng.add_argument('--seed', type=int, default=1)
+    eng.set_defaults(func=bench_engine)
+
+    frames = sub.add_parser('frames', help='full rebuild vs dirty rect frame time')
+    frames.add_argument('--frames', type=int, default=300)
+    frames.add_argument('--width', type=int, default=1920)
+    frames.add_argument('--height', type=int, default=1080)
+    frames.set_defaults(func=bench_frames)
+
+    piles = sub.add_parser('piles', help='per-card vs composited pile draw cost')
+    piles.add_argument('--frames', type=int, default=200)
+    piles.add_argument('--heights', type=int, nargs='+', default=[10, 50, 150])
+    piles.set_defaults(func=bench_piles)
+
+    hand = sub.add_parser('hand', help='per-card vs pre-composited hand draw cost, idle and selecting every frame')
+    hand.add_argument('--frames', type=int, default=2000)
+    hand.add_argument('--hands', type=int, nargs='+', default=[4, 20, 52, 104])
+    hand.set_defaults(func=bench_hand)
+
+    hits = sub.add_parser('hittest', help='per-card rect scan vs grid index for hand clicks')
+    hits.add_argument('--clicks', type=int, default=20000)
+    hits.add_argument('--hands', type=int, nargs='+', default=[4, 20, 52, 104])
+    hits.set_defaults(func=bench_hittest)
+
+    deck = sub.add_parser('deck', help='per-card vs pre-composed deck stack, idle and rebuilt every frame')
+    deck.add_argument('--frames', type=int, default=200)
+    deck.add_argument('--counts', type=int, nargs='+', default=[52, 104, 156])
+    deck.set_defaults(func=bench_deck)
+
+    tweens = sub.add_parser('tweens', help='tuple list vs array tween engine')
+    tweens.add_argument('--counts', type=int, nargs='+', default=[40, 200, 800])
+    tweens.set_defaults(func=bench_tweens)
+
+    res = sub.add_parser('resolution', help='atlas build per display size vs scaling the whole frame every frame')
+    res.add_argument('--frames', type=int, default=100)
+    res.add_argument('--cards', type=int, default=20)
+    res.add_argument('--sizes', nargs='+', default=['1920x1080', '2560x1440', '3840x2160'])
+    res.set_defaults(func=bench_resolution)
+
+    groups = sub.add_parser('groups', help='per-card vs composited group moves, ms per animated frame')
+    groups.add_argument('--counts', type=int, nargs='+', default=[4, 40, 104])
+    groups.set_defaults(func=bench_groups)
+
+    shuffle = sub.add_parser('shuffle', help='quadratic vs Fisher-Yates shoe shuffle and draw')
+    shuffle.add_argument('--decks', type=int, nargs='+', default=[1, 3, 10])
+    shuffle.add_argument('--rounds', type=int, default=200)
+    shuffle.add_argument('--seed', type=int, default=1)
+    shuffle.set_defaults(func=bench_shuffle)
+
+    batch = sub.add_parser('batch', help='NumPy batch evaluate vs evaluate(), equivalence and throughput')
+    batch.add_argument('--size', type=int, default=5000000)
+    batch.add_argument('--games', type=int, default=200, help='self-play games the equivalence cases come from')
+    batch.add_argument('--seed', type=int, default=1)
+    batch.set_defaults(func=bench_batch)
+
+    moves = sub.add_parser('moves', help='legal move generation throughput')
+    moves.add_argument('--states', type=int, default=100000)
+    moves.add_argument('--players', type=int, default=2)
+    moves.add_argument('--seed', type=int, default=1)
+    moves.set_defaults(func=bench_moves)
+
+    search = sub.add_parser('mcts', help='MCTS strength vs greedy, rollouts/s and tree size per move budget')
+    search.add_argument('--games', type=int, default=20)
+    search.add_argument('--budgets', type=int, nargs='+', default=[10, 50, 200])
+    search.add_argument('--workers', type=int, default=1)
+    search.add_argument('--iterations', type=int, default=0, help='fixed rollouts a move instead of the budgets')
+    search.add_argument('--seed', type=int, default=1)
+    search.set_defaults(func=bench_mcts)
+
+    end = sub.add_parser('endgame', help='face-down endgame solve time, nodes/s and table hit rate')
+    end.add_argument('--positions', type=int, default=100, help='face-down decisions from self-play handed to choose()')
+    end.add_argument('--budget-ms', type=float, default=50, help='time choose() gets per decision, as MCTSPlayer gives it')
+    end.add_argument('--slack-ms', type=float, default=25, help='overrun past the budget that still counts as inside it')
+    end.add_argument('--memory-mb', type=int, default=16)
+    end.add_argument('--max-nodes', type=int, default=100000)
+    end.add_argument('--seed', type=int, default=1)
+    end.add_argument('--small', type=int, default=50, help='small endgames that must solve exactly')
+    end.add_argument('--walk-games', type=int, default=50, help='random endgames checking make/unmake against the engine')
+    end.set_defaults(func=bench_endgame)
+
+    vec = sub.add_parser('vecenv', help='vectorized env steps/s across batch sizes')
+    vec.add_argument('--envs', type=int, nargs='+', default=[256, 1024, 4096])
+    vec.add_argument('--steps', type=int, default=1000000)
+    vec.add_argument('--players', type=int, default=2)
+    vec.add_argument('--check-steps', type=int, default=1000, help='steps of 64 games mirrored in the engine')
+    vec.add_argument('--seed', type=int, default=1)
+    vec.set_defaults(func=bench_vecenv)
+
+    snap = sub.add_parser('snapshot', help='packed snapshot size and pack/unpack time vs GameState.copy')
+    snap.add_argument('--states', type=int, default=20000)
+    snap.add_argument('--players', type=int, default=2)
+    snap.add_argument('--seed', type=int, default=1)
+    snap.set_defaults(func=bench_snapshot)
+
+    rep = sub.add_parser('replay', help='log decode + headless replay speed and random seeks')
+    rep.add_argument('--games', type=int, default=500)
+    rep.add_argument('--seeks', type=int, default=20)
+    rep.add_argument('--seed', type=int, default=1)
+    rep.set_defaults(func=bench_replay)
+
+    prof = sub.add_parser('profiler', help='frame profiler cost per frame, off and on')
+    prof.add_argument('--frames', type=int, default=20000)
+    prof.set_defaults(func=bench_profiler)
+
+    tourney = sub.add_parser('tournament', help='self-play games/s across worker counts')
+    tourney.add_argument('--games', type=int, default=4000)
+    tourney.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    tourney.add_argument('--batch-size', type=int, default=250)
+    tourney.add_argument('--strategies', nargs='+', default=['greedy', 'random'])
+    tourney.add_argument('--seed', type=int, default=0)
+    tourney.set_defaults(func=bench_tournament)
+
+    args = parser.parse_args()
+    args.func(args)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+"""Computer players for the headless engine.
+
+A strategy takes a GameState and a random.Random and returns one of
+legal_moves(state) for the player to act.
+"""
+import random
+
+import engine
+
+# Normal cards cheapest first, power cards are held back until needed
+POWER_ORDER = [engine.SEVEN, engine.EIGHT, engine.TWO, engine.TEN]
+
+def play_cost(move: engine.Move) -> int:
+    val = engine.VALS[move.rank]
+    if val in POWER_ORDER:
+        return 100 + POWER_ORDER.index(val)
+    return val
+
+def random_move(state: engine.GameState, rng: random.Random):
+    return rng.choice(engine.legal_moves(state))
+
+def greedy_move(state: engine.GameState, rng: random.Random):
+    """Dump as many of the cheapest playable rank as possible."""
+    moves = engine.legal_moves(state)
+    ranked = [move for move in moves if move.rank >= 0]
+    if not ranked:
+        return rng.choice(moves)
+    return min(ranked, key=lambda move: (play_cost(move), -move.count))
+
+MCTS_BUDGET_MS = 50
+
+def mcts_move(state: engine.GameState, rng: random.Random):
+    """ISMCTS for MCTS_BUDGET_MS, rolling out with greedy_move."""
+    import mcts  # mcts rolls out with the strategies here
+
+    moves = engine.legal_moves(state)
+    if len(moves) < 2:
+        return moves[0]
+    root, _ = mcts.search(state, MCTS_BUDGET_MS, rng.randrange(2 ** 32))
+    return mcts.best_move(moves, {key: child.visits for key, child in root.children.items()})
+
+STRATEGIES = {
+    'random': random_move,
+    'greedy': greedy_move,
+    'mcts': mcts_move,
+}
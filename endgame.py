@@ -0,0 +1,706 @@
+"""Exact two-player endgame solver for once the deck is empty.
+
+Suits never matter to the rules, so a position is just rank counts per
+zone plus the pile's top strength, top val and how many of that val are
+stacked on top (for four of a kind burns). A seven is active when the
+strength is a seven's val, so the strength covers that flag too. Blind
+underhand plays are chance nodes over the underhand's ranks, so values
+are exact win probabilities, 1, 0 or a DRAW wherever no blind card is left.
+Positions are hashed with Zobrist keys kept up to date as moves are
+made and unmade, and stored in a fixed-size transposition table.
+
+Pickups can send play round in circles, so a position is solved over
+the whole graph of positions reachable from it. Components of that graph
+are solved leaves first: a cycle is iterated from all losses and from all
+wins, and where the two bounds differ it is because one side can keep
+play going for ever, which scores as a DRAW. Blind plays and overhand
+plays can't be taken back, so chance nodes never sit on a cycle and the
+cycles settle exactly. The graph is held in memory, so it shares the
+solver's memory budget with the table, and a graph too big for that or
+for the node budget falls back to a search that deepens a few moves at a
+time, whose results also say whether they are exact, a cut off search
+still gives a best guess.
+"""
+import random
+import time
+from array import array
+
+import engine
+from engine import HAND, OVER, UNDER, RANKS, VALS
+from mcts import determinize, move_key
+
+# Count slots, zone z of player p is slot p * 3 + z, the pile comes last
+ZONES = 3
+PILE_SLOT = 2 * ZONES
+
+# Play that goes on for ever scores as a draw
+DRAW = 0.5
+
+# Graph edge targets for a move that ends the game, player 0 won or lost
+WON = -1
+LOST = -2
+
+# Table depth of an entry whose value needed no cut offs
+EXACT = 255
+
+NO_MOVE = -1
+
+def encode_move(zone: int, rank: int, count: int) -> int:
+    return zone << 16 | rank << 8 | count
+
+def decode_move(code: int):
+    return code >> 16, code >> 8 & 0xff, code & 0xff
+
+def is_endgame(state: engine.GameState) -> bool:
+    return len(state.players) == 2 and not state.deck and state.winner is None
+
+def is_face_down(state: engine.GameState) -> bool:
+    """Only overhand and underhand cards left, where solving is quick."""
+    return is_endgame(state) and not any(p.hand for p in state.players)
+
+class SearchLimit(Exception):
+    pass
+
+# Position graph
+def components(edges: list) -> list:
+    """
+    Strongly connected components of the graph reachable from node 0,
+    each one listed after every component it leads to (Tarjan's order).
+    """
+    count = len(edges)
+    order = [-1] * count
+    low = [0] * count
+    on_stack = [False] * count
+    stack = []
+    out = []
+    counter = 0
+    work = [(0, 0)]
+    while work:
+        node, i = work.pop()
+        if i == 0:
+            order[node] = low[node] = counter
+            counter += 1
+            stack.append(node)
+            on_stack[node] = True
+        out_edges = edges[node]
+        descended = False
+        while i < len(out_edges):
+            child = out_edges[i][0]
+            i += 1
+            if child < 0:
+                continue
+            if order[child] < 0:
+                work.append((node, i))
+                work.append((child, 0))
+                descended = True
+                break
+            if on_stack[child] and order[child] < low[node]:
+                low[node] = order[child]
+        if descended:
+            continue
+        if low[node] == order[node]:
+            component = []
+            while True:
+                member = stack.pop()
+                on_stack[member] = False
+                component.append(member)
+                if member == node:
+                    break
+            out.append(component)
+        if work:
+            parent = work[-1][0]
+            if low[node] < low[parent]:
+                low[parent] = low[node]
+    return out
+
+def graph_values(turns: list, chance: list, edges: list, deadline: float = 0.0):
+    """
+    (player 0's win probability in every node, exact). A cycle is swept
+    to a fixpoint from 0 and from 1. The low sweep is what player 0 gets
+    when endless play counts as a loss, the high one when it counts as a
+    win, so with endless play a DRAW the value is DRAW clamped between them.
+    Raises SearchLimit once perf_counter() passes a deadline.
+    """
+    values = [0.0] * len(edges)
+    exact = True
+
+    def backup(node):
+        total = []
+        for child, weight in edges[node]:
+            value = values[child] if child >= 0 else float(child == WON)
+            total.append(weight * value if chance[node] else value)
+        if not total:
+            return DRAW
+        if chance[node]:
+            return sum(total)
+        return max(total) if turns[node] == 0 else min(total)
+
+    def sweep(component, start, rounds):
+        for node in component:
+            values[node] = start
+        changed = True
+        while changed and rounds:
+            changed = False
+            rounds -= 1
+            if deadline and time.perf_counter() > deadline:
+                raise SearchLimit()
+            for node in component:
+                value = backup(node)
+                if value != values[node]:
+                    values[node] = value
+                    changed = True
+        return [values[node] for node in component], not changed
+
+    for component in components(edges):
+        if deadline and time.perf_counter() > deadline:
+            raise SearchLimit()
+        if len(component) == 1 and all(child != component[0] for child, _ in edges[component[0]]):
+            values[component[0]] = backup(component[0])
+            continue
+        # Only a cycle through a chance node could converge slowly, that can't
+        # happen in this game but is capped all the same and reported inexact
+        rounds = 1000 if any(chance[node] for node in component) else -1
+        low, settled_low = sweep(component, 0.0, rounds)
+        high, settled_high = sweep(component, 1.0, rounds)
+        exact = exact and settled_low and settled_high and rounds < 0
+        for node, a, b in zip(component, low, high):
+            values[node] = min(max(a, DRAW), b)
+    return values, exact
+
+# Transposition table
+class TranspositionTable():
+    """
+    Two entries per bucket. The first keeps whichever position took the
+    most nodes to solve, the second always takes the newest, so memory
+    stays at the size asked for however long the solver runs.
+    """
+    ENTRY_BYTES = 8 + 8 + 4 + 4 + 1
+
+    def __init__(self, memory_bytes: int = 16 * 2 ** 20):
+        buckets = 1
+        while buckets * 4 * self.ENTRY_BYTES <= memory_bytes:
+            buckets *= 2
+        self.mask = buckets - 1
+        size = buckets * 2
+        self.keys = array('Q', bytes(8 * size))
+        self.values = array('d', bytes(8 * size))
+        self.moves = array('i', bytes(4 * size))
+        # Nodes it took to solve the entry, 0 marks an empty slot
+        self.work = array('I', bytes(4 * size))
+        # Moves searched below the entry, EXACT when nothing was cut off
+        self.depths = array('B', bytes(size))
+
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+        self.overwrites = 0
+
+    def __len__(self):
+        return len(self.keys)
+
+    def probe(self, key: int, depth: int):
+        """Index of an entry for key searched at least depth deep, or -1."""
+        self.probes += 1
+        i = (key & self.mask) << 1
+        if self.work[i] and self.keys[i] == key and self.depths[i] >= depth:
+            self.hits += 1
+            return i
+        i += 1
+        if self.work[i] and self.keys[i] == key and self.depths[i] >= depth:
+            self.hits += 1
+            return i
+        return -1
+
+    def store(self, key: int, value: float, move: int, depth: int, work: int):
+        i = (key & self.mask) << 1
+        if self.keys[i] != key and work < self.work[i]:
+            i += 1
+        if self.work[i] and self.keys[i] != key:
+            self.overwrites += 1
+        self.keys[i] = key
+        self.values[i] = value
+        self.moves[i] = move
+        self.depths[i] = depth
+        self.work[i] = min(work, 0xffffffff)
+        self.stores += 1
+
+    def clear(self):
+        for buffer in (self.keys, self.values, self.moves, self.work, self.depths):
+            buffer[:] = array(buffer.typecode, bytes(buffer.itemsize * len(buffer)))
+
+    def nbytes(self):
+        return sum(buffer.itemsize * len(buffer) for buffer in (self.keys, self.values, self.moves, self.work, self.depths))
+
+# Solver
+class EndgameSolver():
+    # Bytes an explored graph node takes while it is solved, index entry,
+    # edge list and the per node lists of components() and graph_values()
+    GRAPH_NODE_BYTES = 512
+
+    def __init__(self, memory_bytes: int = 16 * 2 ** 20, decks: int = 1, seed: int = 0):
+        # Half the memory goes to the table, the rest to the graph
+        self.table = TranspositionTable(memory_bytes // 2)
+        self.graph_nodes = max(1, (memory_bytes - self.table.nbytes()) // self.GRAPH_NODE_BYTES)
+        self.max_count = 4 * decks
+
+        rng = random.Random(seed)
+        self.z_count = [[rng.getrandbits(64) for _ in range(self.max_count + 1)]
+                        for _ in range((PILE_SLOT + 1) * RANKS)]
+        self.z_strength = [rng.getrandbits(64) for _ in range(15)]
+        self.z_top = [rng.getrandbits(64) for _ in range(15)]
+        self.z_run = [rng.getrandbits(64) for _ in range(4)]
+        self.z_turn = rng.getrandbits(64)
+
+        self.counts = array('B', bytes((PILE_SLOT + 1) * RANKS))
+        self.totals = [0] * (PILE_SLOT + 1)
+        self.strength = 0
+        self.top_val = 0
+        self.run = 0
+        self.turn = 0
+        self.key = 0
+
+        self.path = set()
+        self.nodes = 0
+        self.max_nodes = 0
+        # perf_counter() time the search gives up at, 0 for none
+        self.deadline = 0.0
+        self.seconds = 0.0
+
+    # Position
+    def load(self, state: engine.GameState) -> bool:
+        """Set up state as the root, False if it is outside what the solver handles."""
+        if not is_endgame(state):
+            return False
+        counts = self.counts
+        for i in range(len(counts)):
+            counts[i] = 0
+        zones = []
+        for p in state.players:
+            zones.extend((p.hand, p.over, p.under))
+        zones.append(state.pile)
+        for slot, zone in enumerate(zones):
+            base = slot * RANKS
+            for card in zone:
+                counts[base + (card >> 2)] += 1
+            self.totals[slot] = len(zone)
+        if max(counts) > self.max_count:
+            return False
+
+        vals = [engine.CARD_VALS[card] for card in state.pile[-3:]]
+        self.strength = state.strength if state.pile else 0
+        self.top_val = vals[-1] if vals else 0
+        self.run = 0
+        for val in reversed(vals):
+            if val != self.top_val:
+                break
+            self.run += 1
+        self.turn = state.turn
+
+        key = self.z_strength[self.strength] ^ self.z_top[self.top_val] ^ self.z_run[self.run]
+        if self.turn:
+            key ^= self.z_turn
+        for i, count in enumerate(counts):
+            key ^= self.z_count[i][count]
+        self.key = key
+        return True
+
+    def set_count(self, i: int, count: int, undo: list):
+        old = self.counts[i]
+        undo.append((i, old))
+        self.key ^= self.z_count[i][old] ^ self.z_count[i][count]
+        self.counts[i] = count
+        self.totals[i // RANKS] += count - old
+
+    def set_top(self, strength: int, top_val: int, run: int):
+        self.key ^= (self.z_strength[self.strength] ^ self.z_strength[strength] ^ self.z_top[self.top_val]
+                     ^ self.z_top[top_val] ^ self.z_run[self.run] ^ self.z_run[run])
+        self.strength = strength
+        self.top_val = top_val
+        self.run = run
+
+    def pickup(self, player: int, undo: list):
+        counts = self.counts
+        pile = PILE_SLOT * RANKS
+        hand = player * ZONES * RANKS
+        for rank in range(RANKS):
+            n = counts[pile + rank]
+            if n:
+                self.set_count(hand + rank, counts[hand + rank] + n, undo)
+                self.set_count(pile + rank, 0, undo)
+        self.set_top(0, 0, 0)
+
+    def make(self, zone: int, rank: int, count: int):
+        """
+        Play count cards of rank from zone for the player to act, same
+        outcome as engine.apply_move. Returns the undo record and whether
+        the player went out.
+        """
+        player = self.turn
+        undo = [(self.strength, self.top_val, self.run, self.turn, self.key)]
+        slot = player * ZONES + zone
+        i = slot * RANKS + rank
+        self.set_count(i, self.counts[i] - count, undo)
+
+        val = VALS[rank]
+        pile = PILE_SLOT * RANKS + rank
+        empty = not self.totals[PILE_SLOT]
+        code = engine.evaluate([val], None if empty else self.strength)
+        again = False
+        if code == 0:
+            # A blind underhand card that can't go, it is picked up with the pile
+            self.set_count(pile, self.counts[pile] + 1, undo)
+            self.pickup(player, undo)
+        else:
+            self.set_count(pile, self.counts[pile] + count, undo)
+            strength = self.strength if code == 5 else val
+            run = self.run + count if val == self.top_val and not empty else count
+            self.set_top(strength, val, min(run, 3))
+            again = code == 2
+            if val == engine.TEN or run >= 4:
+                for rank in range(RANKS):
+                    if self.counts[PILE_SLOT * RANKS + rank]:
+                        self.set_count(PILE_SLOT * RANKS + rank, 0, undo)
+                self.set_top(0, 0, 0)
+                again = True
+
+        base = player * ZONES
+        won = not (self.totals[base] or self.totals[base + 1] or self.totals[base + 2])
+        if not won and not again:
+            self.turn ^= 1
+            self.key ^= self.z_turn
+        return undo, won
+
+    def make_pickup(self):
+        undo = [(self.strength, self.top_val, self.run, self.turn, self.key)]
+        self.pickup(self.turn, undo)
+        self.turn ^= 1
+        self.key ^= self.z_turn
+        return undo
+
+    def unmake(self, undo: list):
+        for i in range(len(undo) - 1, 0, -1):
+            index, count = undo[i]
+            self.totals[index // RANKS] += count - self.counts[index]
+            self.counts[index] = count
+        self.strength, self.top_val, self.run, self.turn, self.key = undo[0]
+
+    def active_zone(self) -> int:
+        base = self.turn * ZONES
+        if self.totals[base]:
+            return HAND
+        if self.totals[base + OVER]:
+            return OVER
+        return UNDER
+
+    def moves(self, zone: int) -> list:
+        """(zone, rank, count) plays for the player to act, bigger plays first."""
+        counts = self.counts
+        base = (self.turn * ZONES + zone) * RANKS
+        top = self.strength if self.totals[PILE_SLOT] else 0
+        moves = []
+        for rank in engine.PLAYABLE_RANKS[top]:
+            n = counts[base + rank]
+            if n:
+                if zone == HAND:
+                    for count in range(n, 0, -1):
+                        moves.append((zone, rank, count))
+                else:
+                    moves.append((zone, rank, 1))
+        return moves
+
+    # Search
+    def estimate(self) -> float:
+        """Stand-in value where the search is cut off, the share of cards the other player holds."""
+        own = self.turn * ZONES
+        mine = self.totals[own] + self.totals[own + 1] + self.totals[own + 2]
+        other = (self.turn ^ 1) * ZONES
+        theirs = self.totals[other] + self.totals[other + 1] + self.totals[other + 2]
+        return theirs / (mine + theirs)
+
+    def child(self, zone: int, rank: int, count: int, depth: int):
+        """(value, exact) of a play for the player making it."""
+        player = self.turn
+        undo, won = self.make(zone, rank, count)
+        if won:
+            value, exact = 1.0, True
+        else:
+            value, exact = self.value(depth - 1)
+            if self.turn != player:
+                value = 1.0 - value
+        self.unmake(undo)
+        return value, exact
+
+    def child_pickup(self, depth: int):
+        player = self.turn
+        undo = self.make_pickup()
+        value, exact = self.value(depth - 1)
+        if self.turn != player:
+            value = 1.0 - value
+        self.unmake(undo)
+        return value, exact
+
+    def value(self, depth: int):
+        """
+        (win probability for the player to act, exact), the fallback search
+        for graphs too big to solve whole. Lines longer than depth moves are
+        cut off with estimate(), and a position that comes round again on
+        the current line scores as a DRAW, neither is exact.
+        """
+        self.nodes += 1
+        if self.max_nodes and self.nodes > self.max_nodes:
+            raise SearchLimit()
+        if self.deadline and not self.nodes & 255 and time.perf_counter() > self.deadline:
+            raise SearchLimit()
+
+        key = self.key
+        table = self.table
+        i = table.probe(key, depth)
+        if i >= 0:
+            return table.values[i], table.depths[i] == EXACT
+        if key in self.path:
+            return DRAW, False
+        if depth == 0:
+            return self.estimate(), False
+        self.path.add(key)
+        start = self.nodes
+
+        zone = self.active_zone()
+        best = NO_MOVE
+        if zone == UNDER:
+            # Blind, every underhand card is as likely as the next
+            base = (self.turn * ZONES + UNDER) * RANKS
+            total = self.totals[self.turn * ZONES + UNDER]
+            value = 0.0
+            exact = True
+            for rank in range(RANKS):
+                n = self.counts[base + rank]
+                if n:
+                    v, e = self.child(UNDER, rank, 1, depth)
+                    value += n / total * v
+                    exact = exact and e
+        else:
+            moves = self.moves(zone)
+            if moves:
+                value = -1.0
+                exact = True
+                for move in moves:
+                    v, e = self.child(*move, depth)
+                    exact = exact and e
+                    if v > value:
+                        value = v
+                        best = encode_move(*move)
+                    if v == 1.0 and e:
+                        # A proven win can't be beaten
+                        exact = True
+                        break
+            else:
+                value, exact = self.child_pickup(depth)
+
+        self.path.discard(key)
+        table.store(key, value, best, EXACT if exact else depth, self.nodes - start + 1)
+        return value, exact
+
+    # Graph
+    def plays(self):
+        """((zone, rank, count, weight) per move, chance) for the player to act, zone -1 a pickup."""
+        zone = self.active_zone()
+        if zone == UNDER:
+            base = (self.turn * ZONES + UNDER) * RANKS
+            total = self.totals[self.turn * ZONES + UNDER]
+            return [(UNDER, rank, 1, self.counts[base + rank] / total)
+                    for rank in range(RANKS) if self.counts[base + rank]], True
+        moves = self.moves(zone)
+        if not moves:
+            return [(-1, 0, 0, 1.0)], False
+        return [move + (1.0,) for move in moves], False
+
+    def explore(self):
+        """
+        Every position reachable from the loaded one, as (turns, chance,
+        edges, index). edges holds (child, weight) pairs per node and index
+        maps keys to nodes. Raises SearchLimit past max_nodes, graph_nodes
+        or the deadline.
+        """
+        index = {self.key: 0}
+        plays, is_chance = self.plays()
+        turns = [self.turn]
+        chance = [is_chance]
+        edges = [[]]
+        self.nodes += 1
+        # (node, plays, next play, undo back to the parent)
+        stack = [[0, plays, 0, None]]
+        while stack:
+            frame = stack[-1]
+            node, plays, i, _ = frame
+            if i == len(plays):
+                stack.pop()
+                if frame[3] is not None:
+                    self.unmake(frame[3])
+                continue
+            frame[2] = i + 1
+            zone, rank, count, weight = plays[i]
+            player = self.turn
+            if zone < 0:
+                undo, won = self.make_pickup(), False
+            else:
+                undo, won = self.make(zone, rank, count)
+            if won:
+                edges[node].append((WON if player == 0 else LOST, weight))
+                self.unmake(undo)
+                continue
+            child = index.get(self.key)
+            if child is not None:
+                edges[node].append((child, weight))
+                self.unmake(undo)
+                continue
+
+            self.nodes += 1
+            if self.max_nodes and self.nodes > self.max_nodes or len(edges) >= self.graph_nodes:
+                raise SearchLimit()
+            if self.deadline and not self.nodes & 255 and time.perf_counter() > self.deadline:
+                raise SearchLimit()
+            child = index[self.key] = len(edges)
+            child_plays, is_chance = self.plays()
+            turns.append(self.turn)
+            chance.append(is_chance)
+            edges.append([])
+            edges[node].append((child, weight))
+            stack.append([child, child_plays, 0, undo])
+        return turns, chance, edges, index
+
+    def graph_root_values(self, moves: list):
+        """root_values over the whole reachable graph, exact unless a cycle had a chance node in it."""
+        turns, chance, edges, index = self.explore()
+        values, exact = graph_values(turns, chance, edges, self.deadline)
+        player = self.turn
+        results = []
+        for move in moves:
+            if move.kind == engine.PICKUP:
+                undo, won = self.make_pickup(), False
+            elif move.zone == UNDER:
+                value = values[0]
+                results.append((move, value if player == 0 else 1.0 - value))
+                continue
+            else:
+                undo, won = self.make(move.zone, move.rank, move.count)
+            value = values[index[self.key]] if not won else float(player == 0)
+            self.unmake(undo)
+            results.append((move, value if player == 0 else 1.0 - value))
+        return results, exact
+
+    def root_values(self, moves: list, depth: int):
+        results = []
+        exact = True
+        for move in moves:
+            if move.kind == engine.PICKUP:
+                value, e = self.child_pickup(depth)
+            elif move.zone == UNDER:
+                # The card is drawn blind whichever one is named
+                value, e = self.value(depth)
+            else:
+                value, e = self.child(move.zone, move.rank, move.count, depth)
+            results.append((move, value))
+            exact = exact and e
+        return results, exact
+
+    def move_values(self, state: engine.GameState, max_nodes: int = 0, max_depth: int = 200, graph: bool = True,
+                    budget_ms: float = 0):
+        """
+        ([(move, win probability)], exact) for every legal move of the
+        player to act in state, assuming every card is where state says.
+        Solves the whole reachable graph when it fits in max_nodes and
+        graph_nodes, otherwise searches one move deeper at a time until
+        the values are exact, max_depth is reached or another max_nodes
+        runs out, and returns the deepest search that finished. None when
+        state isn't a two player endgame or not even the first pass fits.
+        graph=False skips straight to the deepening search. budget_ms
+        bounds the time taken by both.
+        """
+        if not self.load(state):
+            return None
+        moves = engine.legal_moves(state)
+        best = None
+        self.deadline = time.perf_counter() + budget_ms / 1000 if budget_ms else 0.0
+        if graph:
+            self.max_nodes = self.nodes + max_nodes if max_nodes else 0
+            start = time.perf_counter()
+            try:
+                best = self.graph_root_values(moves)
+            except SearchLimit:
+                self.load(state)
+            finally:
+                self.seconds += time.perf_counter() - start
+            if best:
+                self.deadline = 0.0
+                return best
+
+        self.max_nodes = self.nodes + max_nodes if max_nodes else 0
+        start = time.perf_counter()
+        try:
+            for depth in range(2, max_depth + 1, 2):
+                best = self.root_values(moves, min(depth, EXACT - 1))
+                if best[1]:
+                    break
+        except SearchLimit:
+            self.load(state)
+        finally:
+            self.path.clear()
+            self.deadline = 0.0
+            self.seconds += time.perf_counter() - start
+        return best
+
+    def solve(self, state: engine.GameState, max_nodes: int = 0):
+        """(win probability, best move, exact) for the player to act, or None."""
+        results = self.move_values(state, max_nodes)
+        if not results:
+            return None
+        values, exact = results
+        move, value = max(values, key=lambda result: result[1])
+        return value, move, exact
+
+    def hint(self, state: engine.GameState, max_nodes: int = 200000):
+        """Best move for the player to act, None when it can't be worked out."""
+        result = self.solve(state, max_nodes)
+        return result[1] if result else None
+
+    def choose(self, state: engine.GameState, rng: random.Random, samples: int = 4, max_nodes: int = 25000,
+               budget_ms: float = 0):
+        """
+        Best move in a face-down position on average over samples deals of
+        the cards the player to act can't see. None anywhere else, or when
+        a deal can't be solved exactly within max_nodes each and budget_ms
+        for them all, so the caller can fall back on another player.
+        """
+        if not is_face_down(state):
+            return None
+        moves = engine.legal_moves(state)
+        if len(moves) < 2 or moves[0].zone == UNDER:
+            return moves[0] if moves else None
+        deadline = time.perf_counter() + budget_ms / 1000
+        totals = {}
+        for _ in range(samples):
+            left = (deadline - time.perf_counter()) * 1000
+            if budget_ms and left <= 0:
+                return None
+            results = self.move_values(determinize(state, state.turn, rng), max_nodes,
+                                       budget_ms=left if budget_ms else 0)
+            if results is None or not results[1]:
+                return None
+            for move, value in results[0]:
+                key = move_key(move)
+                totals[key] = totals.get(key, 0.0) + value
+        return max(moves, key=lambda move: totals.get(move_key(move), 0.0))
+
+    def stats(self):
+        table = self.table
+        return {
+            'nodes': self.nodes,
+            'nodes_per_second': self.nodes / self.seconds if self.seconds else 0.0,
+            'probes': table.probes,
+            'hits': table.hits,
+            'hit_rate': table.hits / table.probes if table.probes else 0.0,
+            'stores': table.stores,
+            'overwrites': table.overwrites,
+            'entries': len(table),
+            'bytes': table.nbytes(),
+        }
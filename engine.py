@@ -0,0 +1,439 @@
+"""Headless Palace rules.
+
+Nothing in here imports pygame. Cards are small ints, rank * 4 + suit, where
+rank 0 is a 2 and rank 12 an Ace. Rules work on the same vals as
+palace.Card: 2 = 1 ... King = 12, Ace = 14. Zones are array('B'), one byte
+a card, but each array and slot object carries Python's overhead, so a
+live two-player GameState takes about 1.5 KB. snapshot.pack() stores the
+same game in about 110 bytes.
+"""
+import random
+import sys
+from array import array
+from collections import namedtuple
+
+# Power cards (by val)
+TWO = 1
+SEVEN = 6
+EIGHT = 7
+TEN = 9
+
+POWER_LIST = [TWO, SEVEN, EIGHT, TEN]
+
+VALS = [1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 14]
+
+# Card ids
+CARDS = 52
+RANKS = 13
+CARD_VALS = [VALS[card >> 2] for card in range(CARDS)]
+
+def card_id(val: int, suit: int) -> int:
+    return VALS.index(val) * 4 + suit
+
+def card_val(card: int) -> int:
+    return CARD_VALS[card]
+
+def card_suit(card: int) -> int:
+    return card & 3
+
+def sheet_pos(card: int):
+    """Column and row of the card on cards/cards.png, Aces are column 0."""
+    val = CARD_VALS[card]
+    return (0 if val == 14 else val), card & 3
+
+# Zones
+HAND = 0
+OVER = 1
+UNDER = 2
+PILE = 3
+DECK = 4
+
+# Move kinds, DRAW and BURN are only used by the admin commands and replays
+PLAY = 0
+PICKUP = 1
+DRAW = 2
+BURN = 3
+
+# A play names either the exact cards, or just a rank and count for the
+# engine to pick the cards (suits never matter to the rules)
+Move = namedtuple('Move', ['kind', 'zone', 'cards', 'count', 'rank'], defaults=[HAND, (), 0, -1])
+
+def evaluate(vals: list, top) -> int:
+    """
+    Same codes as evaluate_hand, top is the pile's top strength or None
+    when the pile is empty.
+
+    0 - invalid play
+    1 - normal play
+    2 - play power 2 (reset and go again)
+    3 - play power 10 (burn)
+    5 - play power 8 (copy)
+    """
+    if not vals:
+        return 0
+
+    val = vals[0]
+    for other in vals:
+        if other != val:
+            return 0
+
+    if top is None:
+        return 1
+
+    if val == TWO:
+        return 2
+    if val == TEN:
+        return 3
+    if val == EIGHT:
+        return 5
+    if val == SEVEN:
+        return 1
+
+    if top != SEVEN:
+        if val >= top:
+            return 1
+        else:
+            return 0
+    else:
+        if val <= top:
+            return 1
+        else:
+            return 0
+
+def is_burn(vals: list) -> bool:
+    """A 10 on top, or the top four cards share a val."""
+    if not vals:
+        return False
+    if vals[-1] == TEN:
+        return True
+    return len(vals) >= 4 and vals[-1] == vals[-2] == vals[-3] == vals[-4]
+
+# Bitboards, bit r is set when rank r can go on a pile whose top strength
+# is top (0 for an empty pile)
+def playable_mask(top: int) -> int:
+    mask = 0
+    for rank in range(RANKS):
+        if evaluate([VALS[rank]], top or None):
+            mask |= 1 << rank
+    return mask
+
+PLAYABLE = [playable_mask(top) for top in range(15)]
+PLAYABLE_RANKS = [tuple(rank for rank in range(RANKS) if mask >> rank & 1) for mask in PLAYABLE]
+
+# Rank moves never change, so legal_moves hands out shared ones.
+# HAND_PLAYS[rank][n - 1] plays n cards, grown on demand for big shoes
+HAND_PLAYS = [[] for _ in range(RANKS)]
+OVER_PLAYS = [Move(PLAY, OVER, (), 1, rank) for rank in range(RANKS)]
+
+def hand_plays(rank: int, count: int) -> list:
+    plays = HAND_PLAYS[rank]
+    while len(plays) < count:
+        plays.append(Move(PLAY, HAND, (), len(plays) + 1, rank))
+    return plays[:count]
+
+def rank_counts(cards) -> array:
+    counts = array('B', bytes(RANKS))
+    for card in cards:
+        counts[card >> 2] += 1
+    return counts
+
+def rank_mask(cards) -> int:
+    mask = 0
+    for card in cards:
+        mask |= 1 << (card >> 2)
+    return mask
+
+def new_deck(decks: int = 1):
+    """A shoe of one or more full decks, card ids repeat once per deck."""
+    return array('B', range(CARDS)) * decks
+
+# State
+class PlayerState():
+    __slots__ = ('hand', 'over', 'under', 'counts', 'known')
+
+    def __init__(self, hand=(), over=(), under=()):
+        self.hand = array('B', hand)
+        self.over = array('B', over)
+        self.under = array('B', under)
+        # Per-rank count of the hand, kept in step with it by the rules below
+        self.counts = rank_counts(self.hand)
+        # Hand cards every seat has seen, the ones picked up with the pile
+        self.known = array('B')
+
+    def add(self, card: int):
+        self.hand.append(card)
+        self.counts[card >> 2] += 1
+
+
+    def zone(self, zone: int):
+        if zone == HAND:
+            return self.hand
+        if zone == OVER:
+            return self.over
+        return self.under
+
+    def card_count(self):
+        return len(self.hand) + len(self.over) + len(self.under)
+
+    def copy(self):
+        player = PlayerState(self.hand, self.over, self.under)
+        player.known = array('B', self.known)
+        return player
+
+    def nbytes(self):
+        return sys.getsizeof(self) + sum(sys.getsizeof(zone) for zone in (self.hand, self.over, self.under, self.counts, self.known))
+
+class GameState():
+    __slots__ = ('deck', 'players', 'min_hand_size', 'pile', 'strength', 'burned',
+                 'turn', 'winner', 'turns', 'pickups', 'burns')
+
+    def __init__(self, deck, players: list, min_hand_size: int = 4):
+        # Cards are drawn from the end of the deck
+        self.deck = array('B', deck)
+        self.players = players
+        self.min_hand_size = min_hand_size
+
+        self.pile = array('B')
+        self.burned = array('B')
+
+        # Strength of the top pile card, an 8 takes the strength it copied
+        self.strength = 0
+
+        self.turn = 0
+        self.winner = None
+
+        self.turns = 0
+        self.pickups = 0
+        self.burns = 0
+
+    def top(self):
+        """Strength of the top pile card, None on an empty pile."""
+        if not self.pile:
+            return None
+        return self.strength
+
+    def copy(self):
+        state = GameState(self.deck, [player.copy() for player in self.players], self.min_hand_size)
+        state.pile = array('B', self.pile)
+        state.strength = self.strength
+        state.burned = array('B', self.burned)
+        state.turn = self.turn
+        state.winner = self.winner
+        state.turns = self.turns
+        state.pickups = self.pickups
+        state.burns = self.burns
+        return state
+
+    def nbytes(self):
+        total = sys.getsizeof(self) + sys.getsizeof(self.players)
+        for zone in (self.deck, self.pile, self.burned):
+            total += sys.getsizeof(zone)
+        for player in self.players:
+            total += player.nbytes()
+        return total
+
+def new_game(players: int = 2, rng: random.Random = None, min_hand_size: int = 4, decks: int = 1):
+    """
+    Shuffle a fresh shoe and deal 3 under, 3 over and a full hand each.
+    Pass a seeded random.Random to make the deal reproducible.
+    """
+    rng = rng or random.Random()
+    deck = new_deck(decks)
+    # Fisher-Yates, in place
+    rng.shuffle(deck)
+
+    states = []
+    for _ in range(players):
+        under = [deck.pop() for _ in range(3)]
+        over = [deck.pop() for _ in range(3)]
+        states.append(PlayerState((), over, under))
+
+    state = GameState(deck, states, min_hand_size)
+    for i in range(players):
+        refill(state, i)
+    return state
+
+# Rules
+def refill(state: GameState, player: int):
+    p = state.players[player]
+    while len(p.hand) < state.min_hand_size and state.deck:
+        p.add(state.deck.pop())
+
+def active_zone(state: GameState, player: int = None) -> int:
+    """Hand while it or the deck has cards, then the overhand, then the underhand."""
+    if player is None:
+        player = state.turn
+    p = state.players[player]
+    if p.hand or state.deck:
+        return HAND
+    if p.over:
+        return OVER
+    return UNDER
+
+def can_play(state: GameState) -> bool:
+    """Whether the player to act has any legal play."""
+    p = state.players[state.turn]
+    zone = active_zone(state)
+    if zone == UNDER:
+        return bool(p.under)
+    top = state.strength if state.pile else 0
+    if zone == HAND:
+        counts = p.counts
+        for rank in PLAYABLE_RANKS[top]:
+            if counts[rank]:
+                return True
+        return False
+    return bool(rank_mask(p.over) & PLAYABLE[top])
+
+def legal_moves(state: GameState) -> list:
+    """
+    Every legal move for the player to act, in one pass over the playable
+    ranks. Hand plays are rank moves of any count up to what the hand
+    holds, overhand plays are one card of a rank. Underhand cards are
+    face down so each of them is offered by id. PICKUP is only legal when
+    nothing can be played.
+    """
+    if state.winner is not None:
+        return []
+
+    p = state.players[state.turn]
+    zone = active_zone(state)
+    if zone == UNDER:
+        return [Move(PLAY, UNDER, (card,)) for card in p.under]
+
+    top = state.strength if state.pile else 0
+    moves = []
+    if zone == HAND:
+        counts = p.counts
+        for rank in PLAYABLE_RANKS[top]:
+            if counts[rank]:
+                moves.extend(hand_plays(rank, counts[rank]))
+    else:
+        mask = rank_mask(p.over) & PLAYABLE[top]
+        for rank in PLAYABLE_RANKS[0]:
+            if mask >> rank & 1:
+                moves.append(OVER_PLAYS[rank])
+
+    if not moves and state.pile:
+        moves.append(Move(PICKUP))
+    return moves
+
+def can_pickup(state: GameState) -> bool:
+    return bool(state.pile) and not can_play(state)
+
+def pickup(state: GameState, player: int):
+    p = state.players[player]
+    p.hand.extend(state.pile)
+    p.known.extend(state.pile)
+    for card in state.pile:
+        p.counts[card >> 2] += 1
+    del state.pile[:]
+    state.pickups += 1
+
+def burn_pile(state: GameState):
+    state.burned.extend(state.pile)
+    del state.pile[:]
+    state.burns += 1
+
+def end_turn(state: GameState, player: int, again: bool):
+    refill(state, player)
+    if state.players[player].card_count() == 0 and not state.deck:
+        state.winner = player
+        return
+    if not again:
+        state.turn = (player + 1) % len(state.players)
+
+def apply_move(state: GameState, move: Move) -> int:
+    """
+    Apply a move for the player to act and return its evaluate code.
+
+    A PLAY that is not legal leaves the state untouched and returns 0,
+    except for a blind underhand card, which goes onto the pile and is
+    picked up with it. PICKUP, DRAW and BURN are applied as given.
+    """
+    player = state.turn
+    p = state.players[player]
+
+    if move.kind == PICKUP:
+        if not state.pile:
+            return 0
+        pickup(state, player)
+        state.turns += 1
+        end_turn(state, player, False)
+        return 1
+
+    if move.kind == DRAW:
+        for _ in range(min(move.count, len(state.deck))):
+            p.add(state.deck.pop())
+        return 1
+
+    if move.kind == BURN:
+        if move.zone == PILE:
+            if state.pile:
+                burn_pile(state)
+        else:
+            zone = p.zone(move.zone)
+            state.burned.extend(zone)
+            del zone[:]
+            if move.zone == HAND:
+                p.counts = array('B', bytes(RANKS))
+                del p.known[:]
+            end_turn(state, player, True)
+        return 1
+
+    if state.winner is not None or move.zone != active_zone(state, player):
+        return 0
+    zone = p.zone(move.zone)
+    if move.cards:
+        cards = move.cards
+        # A card named twice needs two copies in the zone, from a shoe of decks
+        for card in set(cards):
+            if cards.count(card) > zone.count(card):
+                return 0
+    elif move.rank >= 0 and move.count > 0:
+        cards = [card for card in zone if card >> 2 == move.rank][:move.count]
+        if len(cards) < move.count:
+            return 0
+    else:
+        return 0
+
+    vals = [CARD_VALS[card] for card in cards]
+    top = state.top()
+    code = evaluate(vals, top)
+    if code == 0:
+        if move.zone == UNDER:
+            zone.remove(cards[0])
+            state.pile.append(cards[0])
+            pickup(state, player)
+            state.turns += 1
+            end_turn(state, player, False)
+        return 0
+
+    strength = top if code == 5 else vals[-1]
+    for card in cards:
+        zone.remove(card)
+        state.pile.append(card)
+    if move.zone == HAND:
+        for card in cards:
+            p.counts[card >> 2] -= 1
+            if card in p.known:
+                p.known.remove(card)
+    state.strength = strength
+    state.turns += 1
+
+    again = code == 2
+    if is_burn([CARD_VALS[card] for card in state.pile[-4:]]):
+        burn_pile(state)
+        again = True
+    end_turn(state, player, again)
+    return code
+
+def play_random(state: GameState, rng: random.Random = None, max_turns: int = 10000):
+    """Play uniformly random legal moves until someone wins, returns the winner."""
+    rng = rng or random.Random()
+    while state.winner is None and state.turns < max_turns:
+        moves = legal_moves(state)
+        if not moves:
+            break
+        apply_move(state, rng.choice(moves))
+    return state.winner
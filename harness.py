@@ -0,0 +1,294 @@
+"""Recorded input and a headless end-to-end frame benchmark.
+
+PALACE_RECORD=<path> saves a session's input as it is played: the seed,
+the window size and, per frame, the events the main loop saw. With
+PALACE_INPUT=<path> the client reads its events from such a recording
+instead of the keyboard and mouse. It never waits or sleeps, so replayed
+under SDL's dummy driver the frames run back to back and only the work in
+them is timed. A replay writes its log, saves and asset cache to a
+scratch directory, never over the real ones.
+
+    python harness.py replay REC.json     time one recording
+    python harness.py scenarios           time the scripted scenarios
+    python harness.py compare A.json B.json
+
+Results are JSON: per-frame p50/p95/p99 and the same per main-loop phase,
+taken from the frame profiler.
+
+Recording, JSON
+    version, seed, size [w, h], start (hex snapshot when the session began
+    from a loaded save, else null), frames (how many), events
+    [[frame, [event, ...]], ...] for the frames that had any
+"""
+import json
+import os
+import random
+import runpy
+import subprocess
+import sys
+import tempfile
+
+import pygame
+
+import engine
+import snapshot
+
+VERSION = 1
+
+EVENT_TYPES = {
+    'quit': pygame.QUIT,
+    'keydown': pygame.KEYDOWN,
+    'keyup': pygame.KEYUP,
+    'mousedown': pygame.MOUSEBUTTONDOWN,
+    'mouseup': pygame.MOUSEBUTTONUP,
+}
+EVENT_NAMES = {value: name for name, value in EVENT_TYPES.items()}
+FIELDS = ('key', 'pos', 'button')
+
+def encode_event(event: pygame.event.Event):
+    name = EVENT_NAMES.get(event.type)
+    if name is None:
+        return None
+    out = {'type': name}
+    for field in FIELDS:
+        if hasattr(event, field):
+            value = getattr(event, field)
+            out[field] = list(value) if field == 'pos' else value
+    return out
+
+def decode_event(data: dict) -> pygame.event.Event:
+    fields = {field: tuple(data[field]) if field == 'pos' else data[field] for field in FIELDS if field in data}
+    return pygame.event.Event(EVENT_TYPES[data['type']], **fields)
+
+def load(path: str) -> dict:
+    with open(path) as f:
+        recording = json.load(f)
+    if recording.get('version') != VERSION:
+        raise ValueError('not a palace input recording')
+    return recording
+
+def save(recording: dict, path: str):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(recording, f)
+
+# Input sources, both stand in for the FrameScheduler
+class InputRecorder():
+    """The live scheduler, noting every frame's events as it hands them over."""
+    def __init__(self, scheduler):
+        self.scheduler = scheduler
+        self.frame = 0
+        self.events_by_frame = []
+
+    def events(self, busy: bool):
+        events = self.scheduler.events(busy)
+        self.frame += 1
+        encoded = [data for data in map(encode_event, events) if data is not None]
+        if encoded:
+            self.events_by_frame.append([self.frame, encoded])
+        return events
+
+    def tick(self):
+        self.scheduler.tick()
+
+    def stats(self):
+        return self.scheduler.stats()
+
+    def recording(self, seed: int, size: tuple, start: bytes = None) -> dict:
+        return {
+            'version': VERSION,
+            'seed': seed,
+            'size': list(size),
+            'start': start.hex() if start is not None else None,
+            'frames': self.frame,
+            'events': self.events_by_frame,
+        }
+
+class InputPlayback():
+    """A recording's events frame by frame, uncapped, then a QUIT."""
+    def __init__(self, recording: dict):
+        self.by_frame = {frame: events for frame, events in recording['events']}
+        self.length = recording['frames']
+        self.frame = 0
+
+    def events(self, busy: bool):
+        self.frame += 1
+        if self.frame > self.length:
+            return [pygame.event.Event(pygame.QUIT)]
+        # The real queue is drained so the window stays responsive
+        pygame.event.pump()
+        return [decode_event(data) for data in self.by_frame.get(self.frame, ())]
+
+    def tick(self):
+        pass
+
+    def stats(self):
+        return {'frames': self.frame}
+
+# Scenarios, each a start state and a script of key presses
+def scenario_state(seed: int, pile: int = 0) -> engine.GameState:
+    """A one player deal, with pile cards moved from the deck onto the discard pile."""
+    state = engine.new_game(1, random.Random(seed))
+    cards = [state.deck.pop() for _ in range(min(pile, len(state.deck)))]
+    if cards:
+        # Nothing on top that would burn the pile as soon as it is drawn
+        cards.sort(key=lambda card: engine.card_val(card) == engine.TEN, reverse=True)
+        while engine.is_burn([engine.card_val(card) for card in cards[-4:]]):
+            cards.insert(0, cards.pop())
+        state.pile.extend(cards)
+        state.strength = engine.card_val(cards[-1])
+    return state
+
+def admin(key: int) -> list:
+    """key pressed with admin commands on, toggled off again in the same frame."""
+    return [
+        {'type': 'keydown', 'key': pygame.K_LSHIFT},
+        {'type': 'keydown', 'key': key},
+        {'type': 'keydown', 'key': pygame.K_LSHIFT},
+    ]
+
+SCENARIOS = {
+    'idle': (0, []),
+    'draw_deck': (0, admin(pygame.K_a)),
+    'pickup_pile': (40, admin(pygame.K_d)),
+    'burn_pile': (40, admin(pygame.K_f)),
+}
+
+def scenario(name: str, seed: int = 1, frames: int = 240, size: tuple = (1920, 1080)) -> dict:
+    pile, script = SCENARIOS[name]
+    return {
+        'version': VERSION,
+        'seed': seed,
+        'size': list(size),
+        'start': snapshot.pack(scenario_state(seed, pile)).hex(),
+        'frames': frames,
+        # Frame 1 is the first full draw, act once the table is up
+        'events': [[2, script]] if script else [],
+    }
+
+# Running
+def replay(recording_path: str, trace_path: str = None) -> dict:
+    """Play a recording through the client in this process and time it."""
+    recording = load(recording_path)
+    workdir = tempfile.mkdtemp(prefix='palace-harness-')
+
+    os.environ['SDL_VIDEODRIVER'] = 'dummy'
+    os.environ['PALACE_INPUT'] = recording_path
+    os.environ['PALACE_SEED'] = str(recording['seed'])
+    os.environ['PALACE_WINDOW'] = 'x'.join(str(n) for n in recording['size'])
+    os.environ['PALACE_LOG'] = os.path.join(workdir, 'game.plog')
+    # Nothing the client writes may touch the real saves or asset cache
+    os.environ['PALACE_AUTOSAVE'] = os.path.join(workdir, 'autosave.psav')
+    os.environ['PALACE_SAVE'] = os.path.join(workdir, 'quicksave.psav')
+    os.environ['PALACE_CACHE'] = os.path.join(workdir, 'assets.bin')
+    # The profiler runs while a trace path is set
+    os.environ['PALACE_TRACE'] = trace_path or os.path.join(workdir, 'trace.json')
+    if recording['start']:
+        start_path = os.path.join(workdir, 'start.psav')
+        with open(start_path, 'wb') as f:
+            f.write(bytes.fromhex(recording['start']))
+        os.environ['PALACE_LOAD'] = start_path
+
+    client = runpy.run_path(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'palace.py'), run_name='__main__')
+
+    phases = client['profiler'].summary()
+    game = client['game']
+    return {
+        'frames': len(client['profiler'].trace),
+        'frame_ms': phases.pop('frame', {}),
+        'phases': phases,
+        'renderer': client['game_buffer'].stats(),
+        'turns': game.turns,
+        'pile': len(game.pile),
+        'hand': len(game.players[0].hand),
+    }
+
+def run_scenarios(names: list, seed: int, frames: int, size: tuple) -> dict:
+    """Each scenario in a fresh process, so no cache carries over between them."""
+    results = {}
+    workdir = tempfile.mkdtemp(prefix='palace-scenarios-')
+    for name in names:
+        path = os.path.join(workdir, f'{name}.json')
+        save(scenario(name, seed, frames, size), path)
+        out = subprocess.run([sys.executable, os.path.abspath(__file__), 'replay', path, '--json'],
+                             capture_output=True, text=True, check=True)
+        results[name] = json.loads(out.stdout.splitlines()[-1])
+    return results
+
+def describe(name: str, result: dict):
+    frame = result['frame_ms']
+    print(f'{name}: {result["frames"]} frames, frame p50 {frame.get("p50", 0):.3f} '
+          f'p95 {frame.get("p95", 0):.3f} p99 {frame.get("p99", 0):.3f} ms')
+    for phase, timing in result['phases'].items():
+        print(f'  {phase:<12}p50 {timing["p50"]:.3f}  p95 {timing["p95"]:.3f}  p99 {timing["p99"]:.3f}')
+
+def compare(old: dict, new: dict, point: str = 'p95'):
+    """Print point times that changed between two scenario result files."""
+    for name, result in new['scenarios'].items():
+        before = old['scenarios'].get(name)
+        if before is None:
+            continue
+        rows = [('frame', before['frame_ms'], result['frame_ms'])]
+        for phase, timing in result['phases'].items():
+            if phase in before['phases']:
+                rows.append((phase, before['phases'][phase], timing))
+        print(f'{name} ({point} ms)')
+        for phase, a, b in rows:
+            change = (b[point] - a[point]) / a[point] * 100 if a[point] else 0.0
+            print(f'  {phase:<12}{a[point]:8.3f} -> {b[point]:8.3f}  {change:+6.1f}%')
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Headless recorded-input frame benchmark')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    rep = sub.add_parser('replay', help='time one input recording')
+    rep.add_argument('recording')
+    rep.add_argument('--trace', default=None, help='also write a Chrome trace here')
+    rep.add_argument('--json', action='store_true', help='print the result as one JSON line')
+
+    scen = sub.add_parser('scenarios', help='time the scripted scenarios')
+    scen.add_argument('--only', nargs='+', choices=list(SCENARIOS), default=list(SCENARIOS))
+    scen.add_argument('--seed', type=int, default=1)
+    scen.add_argument('--frames', type=int, default=240)
+    scen.add_argument('--size', default='1920x1080')
+    scen.add_argument('--out', default=None, help='save the results as JSON')
+
+    cmp = sub.add_parser('compare', help='compare two saved scenario results')
+    cmp.add_argument('old')
+    cmp.add_argument('new')
+    cmp.add_argument('--point', default='p95', choices=['p50', 'p95', 'p99', 'mean'])
+
+    args = parser.parse_args()
+
+    if args.command == 'replay':
+        result = replay(args.recording, args.trace)
+        if args.json:
+            print(json.dumps(result))
+        else:
+            describe(os.path.basename(args.recording), result)
+    elif args.command == 'scenarios':
+        size = tuple(int(n) for n in args.size.split('x'))
+        results = {
+            'seed': args.seed,
+            'frames': args.frames,
+            'size': list(size),
+            'pygame': pygame.version.ver,
+            'scenarios': run_scenarios(args.only, args.seed, args.frames, size),
+        }
+        for name, result in results['scenarios'].items():
+            describe(name, result)
+        if args.out:
+            save(results, args.out)
+    else:
+        with open(args.old) as f:
+            old = json.load(f)
+        with open(args.new) as f:
+            new = json.load(f)
+        compare(old, new, args.point)
+
+if __name__ == '__main__':
+    main()
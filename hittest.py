@@ -0,0 +1,77 @@
+# Hit-test index
+class HitIndex():
+    """
+    Finds the card under a point without a rect test per card. Each zone's
+    rects are bucketed into a uniform grid of cell sized squares, and a
+    zone is only re-bucketed when the key it was built with changes. Rects
+    are added bottom to top, so within a bucket the last match is the one
+    drawn on top. An item that moves about inside its rect, like a hand
+    card that is raised and lowered, is bucketed by the whole area and
+    tested against where it is now.
+    """
+    def __init__(self, cell: int = 64):
+        self.cell = cell
+        self.keys = {}
+        self.grids = {}
+        self.current = {}
+
+        self.builds = 0
+        self.queries = 0
+        self.tests = 0
+
+    def stale(self, zone: int, key) -> bool:
+        return zone not in self.keys or self.keys[zone] != key
+
+    def build(self, zone: int, key, items: list, current=None):
+        """
+        Index zone from (item, rect) pairs, bottom to top. current(item),
+        if given, is the rect to test a click against, inside rect.
+        """
+        cell = self.cell
+        grid = {}
+        for item, rect in items:
+            if not rect.width or not rect.height:
+                continue
+            for cx in range(rect.left // cell, (rect.right - 1) // cell + 1):
+                for cy in range(rect.top // cell, (rect.bottom - 1) // cell + 1):
+                    grid.setdefault((cx, cy), []).append((item, rect))
+        self.grids[zone] = grid
+        self.keys[zone] = key
+        self.current[zone] = current
+        self.builds += 1
+
+    def hit(self, zone: int, pos: tuple):
+        """The topmost item of zone under pos, None if there isn't one."""
+        self.queries += 1
+        grid = self.grids.get(zone)
+        if not grid:
+            return None
+        bucket = grid.get((int(pos[0]) // self.cell, int(pos[1]) // self.cell))
+        if bucket:
+            current = self.current[zone]
+            for item, rect in reversed(bucket):
+                self.tests += 1
+                if (current(item) if current else rect).collidepoint(pos):
+                    return item
+        return None
+
+    def hits(self, pos: tuple) -> dict:
+        """zone -> topmost item under pos, for every zone with one."""
+        found = {}
+        for zone in self.grids:
+            item = self.hit(zone, pos)
+            if item is not None:
+                found[zone] = item
+        return found
+
+    def clear(self):
+        self.keys = {}
+        self.grids = {}
+        self.current = {}
+
+    def stats(self):
+        return {
+            'builds': self.builds,
+            'queries': self.queries,
+            'tests_per_query': self.tests / self.queries if self.queries else 0,
+        }
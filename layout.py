@@ -0,0 +1,54 @@
+"""Virtual table coordinates.
+
+Everything is placed on a 1920x1080 table. The viewport fits that table
+into the real display at one uniform scale, centred, and converts points
+and lengths when they are blitted. Sprites are not scaled per frame:
+the atlas is built once at the display's card scale, so every card is
+still one blit.
+"""
+from atlas import CARD_W, SCALE
+
+VIRTUAL_SIZE = (1920, 1080)
+
+# Viewport
+class Viewport():
+    def __init__(self, size: tuple = VIRTUAL_SIZE):
+        self.resize(size)
+
+    def resize(self, size: tuple):
+        """Fit the virtual table into a display of size pixels."""
+        self.size = size
+        self.scale = min(size[0] / VIRTUAL_SIZE[0], size[1] / VIRTUAL_SIZE[1])
+        self.origin = (
+            int((size[0] - VIRTUAL_SIZE[0] * self.scale) / 2),
+            int((size[1] - VIRTUAL_SIZE[1] * self.scale) / 2),
+        )
+
+    def to_screen(self, pos: tuple) -> tuple:
+        return (self.origin[0] + int(pos[0] * self.scale), self.origin[1] + int(pos[1] * self.scale))
+
+    def to_virtual(self, pos: tuple) -> tuple:
+        return ((pos[0] - self.origin[0]) / self.scale, (pos[1] - self.origin[1]) / self.scale)
+
+    def length(self, n: float) -> int:
+        """A virtual distance in screen pixels."""
+        return int(n * self.scale)
+
+    def card_scale(self):
+        """Atlas scale for this display, snapped so cards are whole pixels wide."""
+        width = round(CARD_W * SCALE * self.scale)
+        scale = width / CARD_W
+        return int(scale) if scale.is_integer() else scale
+
+# Shared viewport, the client resizes it to the display at startup
+view = Viewport()
+
+# Hand layout
+def hand_positions(count: int, anchor: tuple, card_w: int = 144, max_len: int = 810) -> list:
+    """Spot of each of count cards centred on anchor, overlapped once they'd be wider than max_len."""
+    if count * card_w <= max_len:
+        spacing = card_w
+    else:
+        spacing = (max_len - card_w) / (count - 1) if count > 1 else 0
+    start_x = anchor[0] - (card_w + spacing * (count - 1)) / 2
+    return [(start_x + i * spacing, anchor[1]) for i in range(count)]
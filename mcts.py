@@ -0,0 +1,255 @@
+"""Information-set Monte Carlo tree search for the headless engine.
+
+One tree is grown for what the player to act knows. Every iteration deals
+the unseen cards (deck, every underhand, the part of opponents' hands
+that wasn't picked up in plain sight) afresh, walks
+the tree using only moves that are legal in that deal, adds one node and
+plays the rest out. Moves are keyed without suits or underhand ids, so
+the same node is reached whatever the deal.
+"""
+import math
+import random
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+import engine
+from bots import STRATEGIES
+
+def move_key(move: engine.Move) -> tuple:
+    """Blind underhand plays all share one key, rank plays key on rank and count."""
+    if move.zone == engine.UNDER:
+        return move.kind, move.zone, 0, -1
+    return move.kind, move.zone, move.count, move.rank
+
+def determinize(state: engine.GameState, player: int, rng: random.Random) -> engine.GameState:
+    """
+    A copy of state with every card player can't see shuffled between the
+    places they could be. Zone sizes are kept, and so are the cards each
+    opponent is known to hold from picking up the pile, so the deal is one
+    player could be facing.
+    """
+    state = state.copy()
+    others = [p for i, p in enumerate(state.players) if i != player]
+    unseen = list(state.deck)
+    for p in state.players:
+        unseen.extend(p.under)
+    hidden = []
+    for p in others:
+        cards = list(p.hand)
+        for card in p.known:
+            cards.remove(card)
+        unseen.extend(cards)
+        hidden.append(len(cards))
+    rng.shuffle(unseen)
+
+    i = len(state.deck)
+    state.deck[:] = array('B', unseen[:i])
+    for p in state.players:
+        n = len(p.under)
+        p.under[:] = array('B', unseen[i:i + n])
+        i += n
+    for p, n in zip(others, hidden):
+        p.hand[:] = p.known + array('B', unseen[i:i + n])
+        p.counts = engine.rank_counts(p.hand)
+        i += n
+    return state
+
+# Tree
+class Node():
+    __slots__ = ('parent', 'key', 'player', 'children', 'visits', 'wins', 'avail')
+
+    def __init__(self, parent=None, key: tuple = None, player: int = -1):
+        self.parent = parent
+        self.key = key
+        # Who made the move into this node, wins are counted for them
+        self.player = player
+        self.children = {}
+        self.visits = 0
+        self.wins = 0.0
+        # Iterations in which this move was legal, stands in for the
+        # parent's visits in UCB since the deal changes every iteration
+        self.avail = 0
+
+    def select(self, moves: dict, exploration: float):
+        """Best of moves, keyed by move_key, each child counted available once."""
+        best = None
+        best_score = -1.0
+        for key, move in moves.items():
+            child = self.children[key]
+            child.avail += 1
+            score = child.wins / child.visits + exploration * math.sqrt(math.log(child.avail) / child.visits)
+            if score > best_score:
+                best = move
+                best_score = score
+        return best
+
+    def size(self):
+        return 1 + sum(child.size() for child in self.children.values())
+
+    def depth(self):
+        return 1 + max((child.depth() for child in self.children.values()), default=0)
+
+def rollout(state: engine.GameState, rng: random.Random, policy, max_turns: int):
+    """Play state out with policy, returns the winner or None."""
+    while state.winner is None and state.turns < max_turns:
+        engine.apply_move(state, policy(state, rng))
+    return state.winner
+
+def search(state: engine.GameState, budget_ms: float = 50, seed: int = None, iterations: int = 0,
+           exploration: float = 0.7, policy: str = 'greedy', rollout_turns: int = 300):
+    """
+    Grow a tree for the player to act for budget_ms (or a fixed number
+    of iterations when iterations is set). Returns the root and stats.
+    """
+    rng = random.Random(seed)
+    player = state.turn
+    play = STRATEGIES[policy]
+    root = Node()
+
+    rollouts = 0
+    start = time.perf_counter()
+    deadline = start + budget_ms / 1000
+    while (rollouts < iterations) if iterations else (time.perf_counter() < deadline):
+        sim = determinize(state, player, rng)
+        max_turns = sim.turns + rollout_turns
+        node = root
+
+        # Selection, down through nodes whose moves are all expanded
+        while sim.winner is None:
+            # One move per key, blind underhand plays would count many times
+            moves = {}
+            for move in engine.legal_moves(sim):
+                moves.setdefault(move_key(move), move)
+            untried = [move for key, move in moves.items() if key not in node.children]
+            if untried:
+                # Expansion
+                move = rng.choice(untried)
+                for key in moves:
+                    child = node.children.get(key)
+                    if child is not None:
+                        child.avail += 1
+                child = Node(node, move_key(move), sim.turn)
+                child.avail = 1
+                node.children[child.key] = child
+                node = child
+                engine.apply_move(sim, move)
+                break
+            move = node.select(moves, exploration)
+            node = node.children[move_key(move)]
+            engine.apply_move(sim, move)
+
+        winner = rollout(sim, rng, play, max_turns)
+        rollouts += 1
+
+        # Backpropagation
+        while node is not None:
+            node.visits += 1
+            if winner is not None and node.player == winner:
+                node.wins += 1
+            node = node.parent
+
+    elapsed = time.perf_counter() - start
+    stats = {
+        'rollouts': rollouts,
+        'ms': elapsed * 1000,
+        'rollouts_per_second': rollouts / elapsed if elapsed else 0.0,
+        'tree_size': root.size(),
+        'tree_depth': root.depth(),
+    }
+    return root, stats
+
+def search_root(state: engine.GameState, budget_ms: float, seed: int, iterations: int,
+                exploration: float, policy: str, rollout_turns: int):
+    """search() for a worker process, only the root's children come back."""
+    root, stats = search(state, budget_ms, seed, iterations, exploration, policy, rollout_turns)
+    return {key: (child.visits, child.wins) for key, child in root.children.items()}, stats
+
+def best_move(moves: list, visits: dict) -> engine.Move:
+    """The most visited of moves, visits is keyed by move_key."""
+    return max(moves, key=lambda move: visits.get(move_key(move), 0))
+
+# Player
+class MCTSPlayer():
+    """
+    Picks moves by ISMCTS. With workers > 1 each process grows its own
+    tree for the whole budget and the root visit counts are summed. Given
+    an endgame.EndgameSolver, face-down positions are solved instead
+    whenever that fits in the budget, and searched with what is left of it
+    when it doesn't.
+    """
+    def __init__(self, budget_ms: float = 50, workers: int = 1, seed: int = None, iterations: int = 0,
+                 exploration: float = 0.7, policy: str = 'greedy', rollout_turns: int = 300, endgame=None):
+        self.budget_ms = budget_ms
+        self.workers = workers
+        self.rng = random.Random(seed)
+        self.iterations = iterations
+        self.exploration = exploration
+        self.policy = policy
+        self.rollout_turns = rollout_turns
+        self.endgame = endgame
+
+        self.pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+
+        self.moves = 0
+        self.solved = 0
+        self.rollouts = 0
+        self.seconds = 0.0
+        self.last = {}
+
+    def choose(self, state: engine.GameState) -> engine.Move:
+        moves = engine.legal_moves(state)
+        if len(moves) < 2:
+            return moves[0] if moves else None
+
+        start = time.perf_counter()
+        budget_ms = self.budget_ms
+        if self.endgame is not None:
+            move = self.endgame.choose(state, self.rng, budget_ms=budget_ms)
+            if move is not None:
+                self.solved += 1
+                return move
+            budget_ms = max(0.0, budget_ms - (time.perf_counter() - start) * 1000)
+
+        options = (self.iterations, self.exploration, self.policy, self.rollout_turns)
+        if self.pool is None:
+            root, stats = search(state, budget_ms, self.rng.randrange(2 ** 32), *options)
+            visits = {key: child.visits for key, child in root.children.items()}
+        else:
+            futures = [self.pool.submit(search_root, state, budget_ms, self.rng.randrange(2 ** 32), *options)
+                       for _ in range(self.workers)]
+            visits = {}
+            stats = {'rollouts': 0, 'tree_size': 0, 'tree_depth': 0}
+            for future in futures:
+                children, worker_stats = future.result()
+                for key, (count, _) in children.items():
+                    visits[key] = visits.get(key, 0) + count
+                stats['rollouts'] += worker_stats['rollouts']
+                stats['tree_size'] += worker_stats['tree_size']
+                stats['tree_depth'] = max(stats['tree_depth'], worker_stats['tree_depth'])
+        elapsed = time.perf_counter() - start
+        stats['ms'] = elapsed * 1000
+        stats['rollouts_per_second'] = stats['rollouts'] / elapsed
+
+        self.moves += 1
+        self.rollouts += stats['rollouts']
+        self.seconds += elapsed
+        self.last = stats
+
+        return best_move(moves, visits)
+
+    def stats(self):
+        return {
+            'moves': self.moves,
+            'solved': self.solved,
+            'rollouts': self.rollouts,
+            'rollouts_per_move': self.rollouts / self.moves if self.moves else 0.0,
+            'rollouts_per_second': self.rollouts / self.seconds if self.seconds else 0.0,
+            'ms_per_move': self.seconds * 1000 / self.moves if self.moves else 0.0,
+            'last_tree_size': self.last.get('tree_size', 0),
+        }
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
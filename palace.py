@@ -1,5 +1,21 @@
+import os
 import pygame
 import random
+import struct
+
+import engine
+import harness
+import replay
+import snapshot
+from assetcache import CACHE_PATH, warm_atlas
+from atlas import CARD_SIZE, atlas, rotations
+from hittest import HitIndex
+from layout import hand_positions, view
+from mcts import MCTSPlayer
+from profiler import FrameProfiler
+from render import PileComposite, Renderer, stack_surface, strip_surface
+from scheduler import FrameScheduler
+from tween import LINEAR, TweenEngine
 
 pygame.init()
 
@@ -7,8 +23,10 @@ FPS = 60
 
 # Codes
 PLAY = pygame.K_RETURN
+SAVE = pygame.K_F5
+LOAD = pygame.K_F9
 
-POWER_LIST = [1, 6, 7, 9]
+POWER_LIST = engine.POWER_LIST
 
 # Destroy Pile
 class DestroyPile():
@@ -19,9 +37,10 @@ class DestroyPile():
 class BurnPile():
     def __init__(self, pos: tuple = (0, 0)):
         self.cards = []
-        self.rotations = []
-        self.rot_cards = []
+        # Tilt of each card, the rotated faces live in the shared cache
+        self.angles = []
         self.pos = pos
+        self.composite = PileComposite()
 
     def draw_pile(self, screen):
         if not self.cards:
@@ -29,27 +48,25 @@ class BurnPile():
 
         x, y = self.pos
 
-        while len(self.rotations) < len(self.cards):
-            card = self.cards[len(self.rotations)]
-            surface = pygame.transform.rotate(card.front_surface, random.randrange(-25, 25))
-            self.rotations.append(surface)
-            self.rot_cards.append(card)
+        while len(self.angles) < len(self.cards):
+            self.angles.append(random.randrange(-25, 25))
 
-        if len(self.rotations) > len(self.cards):
-            self.rotations = self.rotations[:len(self.cards)]
-            self.rot_cards = self.rot_cards[:len(self.cards)]
+        if len(self.angles) > len(self.cards):
+            self.angles = self.angles[:len(self.cards)]
 
-        for i, card in enumerate(self.cards):
-            blit_surface = self.rotations[i]
-            screen.blit(blit_surface, (x + int(i / 3), y - i * 0.1))
+        self.composite.draw(screen, (x, y), self.cards, self.layer)
+
+    def layer(self, i: int):
+        return rotations.get(self.cards[i].key, self.angles[i])
 
 # Discard Pile
 class DiscardPile():
     def __init__(self, pos: tuple = (0, 0)):
         self.cards = []
-        self.rotations = []
-        self.rot_cards = []
+        # Tilt of each card, the rotated faces live in the shared cache
+        self.angles = []
         self.pos = pos
+        self.composite = PileComposite()
 
         self.shake_active = True
         self.shake_duration = 0
@@ -60,28 +77,20 @@ class DiscardPile():
         self.shake_duration = duration_frames
         self.shake_intensity = intensity
 
-    def eval(self, player_hand, event, anim_manager):
-        cards = []
-        for card in self.cards:
-                rect = card.front_surface.get_rect(topleft=(self.pos[0], self.pos[1]))
-                if rect.collidepoint(event.pos):
-                    length = len(player_hand.cards)
-                    tick = 0
-                    for card in player_hand.cards:
-                        if evaluate_hand([card], self) > 0:
-                            self.start_shake(7, 12)
-                            break
-                        if tick == length - 1:
-                            for card in self.cards:
-                                card.flipped = False
-                                card.selected = False
-                                cards.append(card)
-                            x, y = player_hand.anchor
-                            anim_manager.start_move(cards, player_hand, self.pos, (x + 144, y), 13)
-                            self.cards = []
-                            self.rotations = []
-                            self.rot_cards = []
-                        tick += 1
+    def eval(self, player_hand, anim_manager, game: engine.GameState):
+        # The engine already has the cards still flying here, wait for them
+        if anim_manager.moving_to(self):
+            return
+        # Picking up is only legal when nothing can be played
+        if not engine.can_pickup(game):
+            self.start_shake(7, 12)
+            return
+        game_log.apply(game, engine.Move(engine.PICKUP))
+        self.pickup(player_hand)
+
+    def rect(self):
+        # Every card sits at pos, the tilt doesn't count for clicks
+        return pygame.Rect(self.pos, CARD_SIZE)
 
     def pickup(self, player_hand):
         cards = []
@@ -92,8 +101,7 @@ class DiscardPile():
         x, y = player_hand.anchor
         anim_manager.start_move(cards, player_hand, self.pos, (x + 144, y), 13)
         self.cards = []
-        self.rotations = []
-        self.rot_cards = []
+        self.angles = []
 
     def draw_pile(self, screen):
         if not self.cards:
@@ -109,19 +117,16 @@ class DiscardPile():
             if self.shake_duration <= 0:
                 self.shake_active = False
 
-        while len(self.rotations) < len(self.cards):
-            card = self.cards[len(self.rotations)]
-            surface = pygame.transform.rotate(card.front_surface, random.randrange(-5, 5))
-            self.rotations.append(surface)
-            self.rot_cards.append(card)
+        while len(self.angles) < len(self.cards):
+            self.angles.append(random.randrange(-5, 5))
 
-        if len(self.rotations) > len(self.cards):
-            self.rotations = self.rotations[:len(self.cards)]
-            self.rot_cards = self.rot_cards[:len(self.cards)]
+        if len(self.angles) > len(self.cards):
+            self.angles = self.angles[:len(self.cards)]
 
-        for i, card in enumerate(self.cards):
-            blit_surface = self.rotations[i]
-            screen.blit(blit_surface, (x + offset_x + int(i / 3), y + offset_y - i * 0.1))
+        self.composite.draw(screen, (x + offset_x, y + offset_y), self.cards, self.layer)
+
+    def layer(self, i: int):
+        return rotations.get(self.cards[i].key, self.angles[i])
 
 # Buttons
 class Button():
@@ -145,9 +150,10 @@ class Button():
 
     def set_image(self, image_path: str, scale: tuple = (0, 0)):
         self.image_path = image_path
-        image = pygame.image.load(image_path).convert_alpha()
+        image = atlas.get_sprite(image_path)
         self.surface.blit(image, (0, 0))   
         if scale != (0, 0):
+            scale = (view.length(scale[0]), view.length(scale[1]))
             self.surface = pygame.transform.scale(self.surface, scale) 
             self.downsurface = pygame.transform.scale(self.surface, scale)
 
@@ -193,6 +199,16 @@ class PlayerHand():
 
         self.selections = []
 
+        # Card positions and the pre-composited hand for the layout key
+        self.layout = None
+        self.positions = []
+        self.strip = None
+        self.strip_pos = (0, 0)
+
+    def layout_key(self):
+        # Positions follow from the cards, their order and which are raised
+        return tuple(self.cards), tuple(card for card in self.cards if card.selected)
+
     def start_shake(self, duration_frames, intensity, toshake: int = 0):
         self.shake_active = True
         self.shake_duration = duration_frames
@@ -202,51 +218,54 @@ class PlayerHand():
         elif toshake == 1:
             self.undershake = True
 
-    def draw_hand(self, screen):
-        anchor = (475, 725)
-        card_w = 144
-        max_len = 810
+    def place(self, key):
+        """Lay the cards out for key and composite them into one strip."""
+        self.positions = hand_positions(len(self.cards), self.anchor)
+        for card, (x, y) in zip(self.cards, self.positions):
+            card.x, card.y = x, y
+            card.flipped = False
+        self.rest()
 
-        n = len(self.cards)
-        if n == 0:
-            return
+        # Same blits as one per card, the raised cards stick out of the top
+        self.strip, self.strip_pos = strip_surface([card.front_surface for card in self.cards],
+                                                   [card.idle_pos for card in self.cards])
+        self.layout = key
 
-        if n * card_w <= max_len:
-            spacing = card_w
-        else:
-            spacing = (max_len - card_w) / (n - 1) if n > 1 else 0
+    def rest(self):
+        """Put every card back on its laid out spot, raised if selected."""
+        for card, (x, y) in zip(self.cards, self.positions):
+            card.idle_pos = (x, y - card.offset) if card.selected else (x, y)
+
+    def draw_hand(self, screen):
+        if not self.cards:
+            return
 
-        total_width = card_w + spacing * (n - 1)
-        start_x = anchor[0] - (total_width / 2)
-        y = anchor[1]
+        key = self.layout_key()
+        if key != self.layout:
+            self.place(key)
 
-        x = start_x
-        length = len(self.cards)
-        tick = 0
-        for card in self.cards:
-            card.x, card.y = x, y
+        raised = key[1]
+        if self.shake_active and self.shake_duration > 0:
+            for card in raised:
+                card.start_shake(self.shake_duration, self.shake_intensity)
+            self.shake_duration -= 1
+            if self.shake_duration <= 0:
+                self.shake_active = False
 
-            if self.shake_active and self.shake_duration > 0:
-                offset_x = random.randint(-self.shake_intensity, self.shake_intensity)
-                offset_y = random.randint(-self.shake_intensity, self.shake_intensity)
-                if card.selected:
-                    card.start_shake(self.shake_duration, self.shake_intensity)
-                if self.shake_duration <= 0:
-                    self.shake_active = False
-            
-            if tick == length - 1:
-                self.shake_duration -= 1
-            tick += 1
+        if not any(card.shake_active and card.shake_duration > 0 for card in raised):
+            screen.blit(self.strip, self.strip_pos)
+            return
 
+        # Something is shaking, one blit per card until it settles
+        for card, (x, y) in zip(self.cards, self.positions):
             offset_x, offset_y = 0, 0
             if card.selected and card.shake_active:
                 offset_x, offset_y = card.update_shake()
-
-            card.flipped = False
             card.draw_card(screen, (x + offset_x, y + offset_y))
-            x += spacing
+        # The shaken cards moved, the strip still holds them at rest for
+        # when they settle, so only their spots are put back
+        self.rest()
 
-    
     def play_cards(self, anim, discard_pile: DiscardPile):
         cards = []
         for card in self.selections:
@@ -273,14 +292,11 @@ class Card():
         # Hearts = 0, Diamonds = 1, Spades = 2, Clubs = 3
         self.suit = clamp(0, 3, suit)
 
-        fx, fy, fwidth, fheight = (val*48), (suit*64), 48, 64
-        front_rect = pygame.Rect(fx, fy, fwidth, fheight)
-
-        self.front_surface = pygame.Surface((fwidth, fheight), pygame.SRCALPHA)
-        image = pygame.image.load('cards/cards.png').convert_alpha()
-        self.front_surface.blit(image, (0, 0), front_rect)
+        # How the engine refers to this card
+        self.key = engine.card_id(self.val, self.suit)
 
-        self.front_surface = pygame.transform.scale(self.front_surface, (144, 192))
+        # Shared with every other card of the same face
+        self.front_surface = atlas.get_card(self.key)
 
         self.idle_pos = (0, 0)
         self.final_pos = (0, 0)
@@ -375,22 +391,19 @@ class Card():
             self.offset = 0
 
 class Deck():
-    def __init__(self, max_hand_size: int = 4):
+    def __init__(self, max_hand_size: int = 4, decks: int = 1, rng: random.Random = None):
         self.cards = []
-        bx, by, bwidth, bheight = 0, 256, 48, 64
-        back_rect = pygame.Rect(bx, by, bwidth, bheight)
+        self.back_surface = atlas.get_back()
 
-        self.back_surface = pygame.Surface((bwidth, bheight), pygame.SRCALPHA)
-        image = pygame.image.load('cards/cards.png').convert_alpha()
-        self.back_surface.blit(image, (0, 0), back_rect)
+        # Per-game stream, seed it to replay a deal
+        self.rng = rng or random.Random()
 
-        self.back_surface = pygame.transform.scale(self.back_surface, (144, 192))
+        for _ in range(decks):
+            for suit in range(4):
+                for n in range(13):
+                    val = n
 
-        for suit in range(4):
-            for n in range(13):
-                val = n
-
-                self.cards.append(Card(val, suit, self.back_surface))
+                    self.cards.append(Card(val, suit, self.back_surface))
         
         self.current = self.cards
 
@@ -398,18 +411,28 @@ class Deck():
 
         self.discards = []
 
+        # Whole stack pre-rendered for the current card count
+        self.stack = None
+        self.stack_count = 0
+        self.stack_top = 0
+
     # Draw Functions
 
+    def build_stack(self, count: int):
+        self.stack, self.stack_top = stack_surface(self.back_surface, count)
+        self.stack_count = count
+
     def draw_deck(self, screen):
-        index = 0
+        count = len(self.current)
+        if count == 0:
+            return
+        if count != self.stack_count:
+            self.build_stack(count)
 
         x = self.anchor[0]
         y = self.anchor[1]
 
-        for card in self.current:
-            screen.blit(card.back_surface, (x+int(index/3), y-index))
-            index+=0.5
-            
+        screen.blit(self.stack, (x, y - self.stack_top))
 
     # Print functions
     
@@ -432,25 +455,16 @@ class Deck():
     # Card management
 
     def shuffle(self):
-        all_cards = self.cards
-        new_cards = []
-
-        for _ in range(len(self.cards)):
-            card = random.choice(all_cards)
-            all_cards.remove(card)
-            new_cards.append(card)
-        
-        self.cards = new_cards
+        # Fisher-Yates, in place
+        self.rng.shuffle(self.cards)
         self.current = self.cards
         self.discards = []
     
     def get_card(self, player: PlayerHand = PlayerHand(4), n: int = 1):
+        # The top of the deck is the end of the list
         cards = []
         for _ in range(n):
-            card = self.current[0]
-
-            self.current.remove(card)
-            cards.append(card)
+            cards.append(self.current.pop())
         return cards
 
     def discard(self, index: int = 0):
@@ -464,8 +478,7 @@ class UnderHand():
         self.pos = pos
         x, y = pos
         for i in range(3):
-            card = random.choice(deck.current)
-            deck.current.remove(card)
+            card = deck.current.pop()
             card.position = (x + i * 150, y)
             self.cards.append(card)
 
@@ -488,26 +501,22 @@ class UnderHand():
         card.shake_duration = duration_frames
         card.shake_intensity = intensity
 
-    def play_card(self, card, discard_pile: DiscardPile, player_hand: PlayerHand, anim_manager, destroy_pile: DestroyPile):
+    def play_card(self, card, code: int, discard_pile: DiscardPile, player_hand: PlayerHand, anim_manager, destroy_pile: DestroyPile):
         if card in self.cards:
-            match evaluate_hand([card], discard_pile):
+            self.cards.remove(card)
+            match code:
                 case 0:
-                    self.cards.remove(card)
-                    anim_manager.start_move(card, discard_pile, card.idle_pos, discard_pile.pos, 13)
-                case 1:
-                    self.cards.remove(card)
-                    anim_manager.start_move(card, discard_pile, card.idle_pos, discard_pile.pos, 13)
-                case 2:
-                    self.cards.remove(card)
-                    anim_manager.start_move(card, discard_pile, card.idle_pos, discard_pile.pos, 13)
-                case 3:
-                    self.cards.remove(card)
-                    anim_manager.start_move(card, discard_pile, card.idle_pos, discard_pile.pos, 13)
+                    # Blind play failed, the card goes up with the pile
+                    card.flipped = False
+                    x, y = player_hand.anchor
+                    anim_manager.start_move(card, player_hand, card.idle_pos, (x + 144, y), 13)
+                    discard_pile.pickup(player_hand)
                 case 5:
-                    self.cards.remove(card)
                     strength = discard_pile.cards[-1].strength if discard_pile.cards else 8
                     card.strength = strength
-                    anim_manager.start_move(card, discard_pile, card.idle_pos, discard_pile.pos, 13)         
+                    anim_manager.start_move(card, discard_pile, card.idle_pos, discard_pile.pos, 13)
+                case _:
+                    anim_manager.start_move(card, discard_pile, card.idle_pos, discard_pile.pos, 13)
 
 class OverHand():
     def __init__(self, deck: Deck, pos: tuple = (0, 0)):
@@ -515,8 +524,7 @@ class OverHand():
         self.pos = pos
         x, y = pos
         for i in range(3):
-            card = random.choice(deck.current)
-            deck.current.remove(card)
+            card = deck.current.pop()
             card.position = (x + i * 150, y)
             self.cards.append(card)
 
@@ -539,95 +547,122 @@ class OverHand():
         card.shake_duration = duration_frames
         card.shake_intensity = intensity
 
-    def play_card(self, card, discard_pile: DiscardPile, player_hand: PlayerHand, anim_manager, destroy_pile: DestroyPile):
+    def play_card(self, card, code: int, discard_pile: DiscardPile, player_hand: PlayerHand, anim_manager, destroy_pile: DestroyPile):
         if card in self.cards:
-            match evaluate_hand([card], discard_pile):
+            match code:
                 case 0:
+                    self.start_card_shake(card, 7, 12)
+                case 5:
                     self.cards.remove(card)
+                    strength = discard_pile.cards[-1].strength if discard_pile.cards else 8
+                    card.strength = strength
                     anim_manager.start_move(card, discard_pile, card.idle_pos, discard_pile.pos, 13)
-                case 1:
-                    self.cards.remove(card)
-                    anim_manager.start_move(card, discard_pile, card.idle_pos, discard_pile.pos, 13)
-                case 2:
-                    self.cards.remove(card)
-                    anim_manager.start_move(card, discard_pile, card.idle_pos, discard_pile.pos, 13)
-                case 3:
+                case _:
                     self.cards.remove(card)
                     anim_manager.start_move(card, discard_pile, card.idle_pos, discard_pile.pos, 13)
-                case 5:
-                    self.cards.remove(card)
-                    strength = discard_pile.cards[-1].strength if discard_pile.cards else 8
-                    card.strength = strength   
 
 class Player():
-    def __init__(self, deck: Deck, name: str = 'Player', start: bool = True):
+    def __init__(self, deck: Deck, name: str = 'Player', start: bool = True, ai: MCTSPlayer = None):
         self.name = name
         self.hand = PlayerHand(4)
         self.underhand = UnderHand(deck, (950, 725))
         self.overhand = OverHand(deck, (955, 710))
         self.flipped = False  
         self.is_turn = start
+        # Computer players pick their moves with MCTS, None for a human
+        self.ai = ai
     
     def draw(self, screen):
         self.hand.draw_hand(screen)
         self.underhand.draw_underhand(screen)
         self.overhand.draw_overhand(screen)
 
-    def turn(self):
-        pass
+    def turn(self, game: engine.GameState):
+        """The engine move a computer player makes on its turn, None for a human."""
+        if self.ai is None:
+            return None
+        return self.ai.choose(game)
+
+# Card groups
+class CardGroup():
+    """
+    Cards that travel together. They would all be drawn at the same spot,
+    so they are composited into one sprite when the move starts and the
+    whole group is a single tween and a single blit.
+    """
+    def __init__(self, cards: list[Card], start_pos: tuple):
+        self.cards = cards
+        self.idle_pos = start_pos
+        self.traveling = True
+
+        # Each card where draw_card would put it, relative to the group
+        layers = []
+        for card in cards:
+            if card.flipped:
+                layers.append((card.back_surface, 0))
+            else:
+                layers.append((card.front_surface, -card.offset if card.selected else 0))
+
+        self.top = min(dy for _, dy in layers)
+        width = max(surface.get_width() for surface, _ in layers)
+        height = max(surface.get_height() + view.length(dy - self.top) for surface, dy in layers)
+        self.surface = pygame.Surface((width, height), pygame.SRCALPHA)
+        for surface, dy in layers:
+            self.surface.blit(surface, (0, view.length(dy - self.top)))
+
+    def draw_card(self, screen, pos: tuple = (0, 0), deck = None):
+        screen.blit(self.surface, (pos[0], pos[1] + self.top))
 
 # Anim manager
 class AnimationManager():
     def __init__(self):
-        self.anim_cards = []
+        self.tweens = TweenEngine()
+        # Cards in flight, the tween engine keeps this list compacted in place
+        self.anim_cards = self.tweens.items
     
-    def start_move(self, cards: list[Card], destination, start_pos: tuple, end_pos: tuple, duration_frames: int, task: str = 'move'):
+    def start_move(self, cards: list[Card], destination, start_pos: tuple, end_pos: tuple, duration_frames: int, task: str = 'move', ease: int = LINEAR):
+        # Debugging output
+        if not hasattr(destination, 'cards'):
+            print(f"Invalid destination: {destination}")
+            return
+
         if isinstance(cards, Card):
-            card = cards
-            card.idle_pos = start_pos
-            info = (start_pos, end_pos, duration_frames, card, destination, 0)
-            self.anim_cards.append(info)
-            card.traveling = True
+            cards = [cards]
+        if len(cards) > 1:
+            for card in cards:
+                card.idle_pos = start_pos
+                card.traveling = True
+            self.tweens.add(CardGroup(list(cards), start_pos), destination, start_pos, end_pos, duration_frames, ease)
             return
         for card in cards:
             card.idle_pos = start_pos
-            info = (start_pos, end_pos, duration_frames, card, destination, 0)
-            self.anim_cards.append(info)
+            self.tweens.add(card, destination, start_pos, end_pos, duration_frames, ease)
             card.traveling = True
 
-    def update_move(self, deck: Deck = None):
-        to_remove = []
-        for info in self.anim_cards:
-            start_pos, end_pos, duration_frames, card, destination, tick = info
-            
-            # Debugging output
-            if not hasattr(destination, 'cards'):
-                print(f"Invalid destination: {destination}")
-                continue
+    def moving_to(self, destination) -> bool:
+        return any(target is destination for target in self.tweens.targets)
 
-            if tick >= duration_frames:
-                card.idle_pos = end_pos
-                card.traveling = False
-                to_remove.append(info)
-                destination.cards.append(card)
+    def update_move(self, deck: Deck = None):
+        finished = self.tweens.step()
+
+        for card, x, y in zip(self.tweens.items, self.tweens.x, self.tweens.y):
+            card.idle_pos = (x, y)
+
+        # Hand over cards that have finished moving
+        for card, destination, end_pos in finished:
+            if isinstance(card, CardGroup):
+                # The whole group lands at once, in the order it left
+                for member in card.cards:
+                    member.idle_pos = end_pos
+                    member.traveling = False
+                destination.cards.extend(card.cards)
                 continue
-
-            progress = tick / duration_frames
-            new_x = start_pos[0] + (end_pos[0] - start_pos[0]) * progress
-            new_y = start_pos[1] + (end_pos[1] - start_pos[1]) * progress
-            card.idle_pos = (new_x, new_y)
-
-            tick += 1
-            new_info = (start_pos, end_pos, duration_frames, card, destination, tick)
-            self.anim_cards[self.anim_cards.index(info)] = new_info
-
-        # Remove cards that have finished moving
-        for info in to_remove:
-            self.anim_cards.remove(info)
+            card.idle_pos = end_pos
+            card.traveling = False
+            destination.cards.append(card)
 
     def draw_cards(self, screen):
-        for info in self.anim_cards:
-            _, _, _, card, _, _ = info
+        for card in self.anim_cards:
             card.draw_card(screen, card.idle_pos, deck)       
         
 def evaluate_hand(hand: list[Card], discard: DiscardPile) -> int:
@@ -640,58 +675,83 @@ def evaluate_hand(hand: list[Card], discard: DiscardPile) -> int:
     5 - play power 8 (copy)
     """
 
-    if not discard.cards:
-        return 1
-
-    if not hand:
-        return 0
+    top_val = discard.cards[-1].strength if discard.cards else None
+    return engine.evaluate([card.val for card in hand], top_val)
 
-    first_val = hand[0].val
-    for card in hand:
-        if card.val != first_val:
-            return 0
+# Screen, PALACE_WINDOW=WxH opens a window of that size instead
+if os.environ.get('PALACE_WINDOW'):
+    screen = pygame.display.set_mode(tuple(int(n) for n in os.environ['PALACE_WINDOW'].split('x')))
+else:
+    screen = pygame.display.set_mode((0, 0), pygame.FULLSCREEN)
+pygame.display.set_caption('Palace')
 
-    val = first_val
+# The table is laid out in virtual coordinates, fitted to the display
+view.resize(screen.get_size())
 
-    if val == 1:
-        return 2 
-    if val == 9:
-        return 3
-    if val == 7:
-        return 5
-    if val == 6:
-        return 1
+# Sprites, scaled once for the display, from the baked cache when it is up to
+# date. PALACE_CACHE keeps the cache somewhere else
+atlas.scale = view.card_scale()
+warm_atlas(atlas, os.environ.get('PALACE_CACHE', CACHE_PATH))
 
-    top_val = discard.cards[-1].strength
+# Kept between frames, only the regions that changed get redrawn
+game_buffer = Renderer(screen.get_size(), WHITE)
 
-    if top_val != 6:
-        if val >= top_val:
-            return 1
-        else:
-            return 0
-    else:
-        if val <= top_val:
-            return 1
-        else:
-            return 0
+# Clock, drops to waiting on input while nothing moves. PALACE_RECORD saves
+# the input as it is played, PALACE_INPUT plays a recording back uncapped
+if os.environ.get('PALACE_INPUT'):
+    scheduler = harness.InputPlayback(harness.load(os.environ['PALACE_INPUT']))
+else:
+    scheduler = FrameScheduler(FPS)
+    if os.environ.get('PALACE_RECORD'):
+        scheduler = harness.InputRecorder(scheduler)
 
-# Screen
-screen = pygame.display.set_mode((0, 0), pygame.FULLSCREEN)
-game_buffer = pygame.Surface((0, 0), pygame.FULLSCREEN)
-pygame.display.set_caption('Palace')
-
-# Clock
-clock = pygame.time.Clock()
+# Phase timings, shown while admin commands are on. PALACE_TRACE keeps it
+# running the whole game and writes a Chrome trace there on quit
+profiler = FrameProfiler()
+trace_path = os.environ.get('PALACE_TRACE')
+profiler.enabled = bool(trace_path)
 
 # Game Variables
-deck = Deck()
+# PALACE_REPLAY plays a saved log back at PALACE_REPLAY_SPEED moves a second
+playback = replay.load(os.environ['PALACE_REPLAY']) if os.environ.get('PALACE_REPLAY') else None
+playback_speed = float(os.environ.get('PALACE_REPLAY_SPEED', 2))
+playback_position = 0
+playback_due = 0
+
+if playback is not None:
+    game_seed = playback.seed
+else:
+    game_seed = int(os.environ.get('PALACE_SEED', random.randrange(2 ** 32)))
+# Pile tilts and shakes too, so a seed redraws the same frames
+random.seed(game_seed)
+deck = Deck(rng=random.Random(game_seed))
 deck.shuffle()
 player_hand = PlayerHand(4)
 underhand = UnderHand(deck, (950, 725))
 overhand = OverHand(deck, (955, 710))
-player1 = Player(deck, 'player1', True)
+# PALACE_AI=<ms> seats the computer, thinking that long a move, in place of the mouse
+ai = MCTSPlayer(float(os.environ['PALACE_AI']), seed=game_seed) if os.environ.get('PALACE_AI') else None
+player1 = Player(deck, 'player1', True, ai)
 flipped = False
 
+# Rules live in the engine, the sprites below just mirror it
+game = engine.GameState(
+    [card.key for card in deck.current],
+    [engine.PlayerState([], [card.key for card in player1.overhand.cards], [card.key for card in player1.underhand.cards])],
+)
+engine.refill(game, 0)
+
+# Every move handed to the engine, saved on quit so the game can be rebuilt
+game_log = replay.ActionLog(game_seed, game)
+log_path = os.environ.get('PALACE_LOG', os.path.join('logs', f'{game_seed}.plog'))
+
+# F5 and F9 save and load here, every finished turn is also kept in the
+# autosave so a crashed game can be picked up with PALACE_LOAD.
+# PALACE_AUTOSAVE moves the autosave, set empty it turns it off
+save_path = os.environ.get('PALACE_SAVE', os.path.join('saves', 'quicksave.psav'))
+autosave_path = os.environ.get('PALACE_AUTOSAVE', os.path.join('saves', 'autosave.psav'))
+autosaved_turns = game.turns
+
 destroy_pile = DestroyPile()
 
 button_manager = ButtonManager()
@@ -714,110 +774,322 @@ def screen_start_shake(duration_frames, intensity):
     shake_duration = duration_frames
     shake_intensity = intensity
 
+# Clicks look cards up here, a zone is only re-indexed once its cards change
+hit_index = HitIndex()
+
+# How far a selected hand card is lifted
+RAISE = 50
+
+def hand_card_rect(card: Card):
+    return pygame.Rect((card.x, card.y - card.offset if card.selected else card.y), CARD_SIZE)
+
+def index_cards():
+    hand = player1.hand
+    key = hand.layout_key()
+    if hand.cards and key != hand.layout:
+        # Not drawn since the cards or the selection changed, lay them out
+        # first so the rects come from where they are about to be
+        hand.place(key)
+    # Each card is bucketed with room to be raised and tested where it is,
+    # so only new cards or a new order re-index the hand, not selecting
+    key = key[0]
+    if hit_index.stale(engine.HAND, key):
+        hit_index.build(engine.HAND, key, [
+            (card, pygame.Rect(x, y - RAISE, CARD_SIZE[0], CARD_SIZE[1] + RAISE))
+            for card, (x, y) in zip(hand.cards, hand.positions)
+        ], hand_card_rect)
+
+    key = tuple(player1.underhand.cards)
+    if hit_index.stale(engine.UNDER, key):
+        hit_index.build(engine.UNDER, key, [(card, pygame.Rect(card.position, CARD_SIZE)) for card in key])
+
+    key = tuple(player1.overhand.cards)
+    if hit_index.stale(engine.OVER, key):
+        hit_index.build(engine.OVER, key, [(card, pygame.Rect(card.position, CARD_SIZE)) for card in key])
+
+    key = bool(discard_pile.cards)
+    if hit_index.stale(engine.PILE, key):
+        hit_index.build(engine.PILE, key, [(discard_pile, discard_pile.rect())] if key else [])
+
+def scene_busy():
+    if game_buffer.changed or anim_manager.anim_cards or shake_active:
+        return True
+    if playback is not None and playback_position < len(playback):
+        return True
+    if discard_pile.shake_active and discard_pile.shake_duration > 0:
+        return True
+    if player1.hand.shake_active and player1.hand.shake_duration > 0:
+        return True
+    for card in player1.hand.cards + player1.underhand.cards + player1.overhand.cards:
+        if card.shake_active and card.shake_duration > 0:
+            return True
+    return False
+
+# Moves, shared by the keys, the mouse and log playback
+def play_selection():
+    move = engine.Move(engine.PLAY, engine.HAND, tuple(card.key for card in player1.hand.selections))
+    match game_log.apply(game, move):
+        case 0:
+            player1.hand.start_shake(7, 12)
+        case 1:
+            player1.hand.play_cards(anim_manager, discard_pile)
+        case 2:
+            player1.hand.play_cards(anim_manager, discard_pile)
+        case 3:
+            player1.hand.play_cards(anim_manager, discard_pile)
+        case 5:
+            strength = discard_pile.cards[-1].strength if discard_pile.cards else 0
+            for card in player1.hand.selections:
+                card.strength = strength
+            player1.hand.play_cards(anim_manager, discard_pile)
+        case _:
+            pass
+
+def draw_cards(n: int):
+    game_log.apply(game, engine.Move(engine.DRAW, count=n))
+    x, y = player1.hand.anchor
+    anim_manager.start_move(deck.get_card(player_hand, n), player1.hand, deck.anchor, (x + 144, y), 13)
+
+def pickup_pile():
+    game_log.apply(game, engine.Move(engine.PICKUP))
+    discard_pile.pickup(player1.hand)
+
+def burn_discards():
+    game_log.apply(game, engine.Move(engine.BURN, engine.PILE))
+    cards = []
+    for card in discard_pile.cards:
+        cards.append(card)
+    anim_manager.start_move(cards, burn_pile, discard_pile.pos, burn_pile.pos, 13)
+    discard_pile.cards = []
+    discard_pile.angles = []
+    screen_start_shake(40, 25)
+
+def burn_hand():
+    game_log.apply(game, engine.Move(engine.BURN, engine.HAND))
+    cards = []
+    for card in player1.hand.cards:
+        cards.append(card)
+    anim_manager.start_move(cards, burn_pile, player1.hand.anchor, burn_pile.pos, 13)
+    player1.hand.cards = []
+    screen_start_shake(40, 25)
+
+def play_underhand(card):
+    # A failed blind play takes the pile, including cards not yet on it
+    if anim_manager.moving_to(discard_pile):
+        return
+    if engine.active_zone(game) == engine.UNDER:
+        code = game_log.apply(game, engine.Move(engine.PLAY, engine.UNDER, (card.key,)))
+        player1.underhand.play_card(card, code, discard_pile, player1.hand, anim_manager, destroy_pile)
+    else:
+        player1.underhand.start_card_shake(card, 7, 12)
+
+def play_overhand(card):
+    if engine.active_zone(game) == engine.OVER:
+        code = game_log.apply(game, engine.Move(engine.PLAY, engine.OVER, (card.key,)))
+        player1.overhand.play_card(card, code, discard_pile, player1.hand, anim_manager, destroy_pile)
+    else:
+        player1.overhand.start_card_shake(card, 7, 12)
+
+def find_card(cards: list, key: int):
+    for card in cards:
+        if card.key == key:
+            return card
+    return None
+
+def rank_keys(cards: list, rank: int, count: int) -> list:
+    return [card.key for card in cards if card.key >> 2 == rank][:count]
+
+def play_logged(move: engine.Move):
+    """
+    Make a logged move through the same paths a key or click would. Rank
+    moves, as legal_moves gives them, take the first cards of that rank.
+    """
+    if move.kind == engine.PICKUP:
+        pickup_pile()
+    elif move.kind == engine.DRAW:
+        draw_cards(min(move.count, len(deck.current)))
+    elif move.kind == engine.BURN:
+        if move.zone == engine.PILE:
+            burn_discards()
+        else:
+            burn_hand()
+    elif move.zone == engine.HAND:
+        for card in list(player1.hand.selections):
+            card.select(player1.hand)
+        for key in move.cards or rank_keys(player1.hand.cards, move.rank, move.count):
+            card = find_card([card for card in player1.hand.cards if not card.selected], key)
+            if card is not None:
+                card.select(player1.hand, offset=50)
+        play_selection()
+    elif move.zone == engine.UNDER:
+        card = find_card(player1.underhand.cards, move.cards[0])
+        if card is not None:
+            play_underhand(card)
+    elif move.zone == engine.OVER:
+        keys = move.cards or rank_keys(player1.overhand.cards, move.rank, 1)
+        card = find_card(player1.overhand.cards, keys[0]) if keys else None
+        if card is not None:
+            play_overhand(card)
+
+# Save & load
+def card_from_key(key: int) -> Card:
+    val = engine.card_val(key)
+    return Card(0 if val == 14 else val, engine.card_suit(key), deck.back_surface)
+
+def rebuild_sprites():
+    """New sprites wherever the engine has each card, faces come from the atlas."""
+    anim_manager.tweens.clear()
+    p = game.players[0]
+
+    deck.cards = [card_from_key(key) for key in game.deck]
+    deck.current = deck.cards
+    deck.stack_count = 0
+
+    player1.hand.cards = [card_from_key(key) for key in p.hand]
+    player1.hand.selections = []
+    for zone, keys in ((player1.overhand, p.over), (player1.underhand, p.under)):
+        x, y = zone.pos
+        zone.cards = []
+        for i, key in enumerate(keys):
+            card = card_from_key(key)
+            card.position = (x + i * 150, y)
+            zone.cards.append(card)
+
+    discard_pile.cards = [card_from_key(key) for key in game.pile]
+    discard_pile.angles = []
+    if discard_pile.cards:
+        discard_pile.cards[-1].strength = game.strength
+    burn_pile.cards = [card_from_key(key) for key in game.burned]
+    burn_pile.angles = []
+    game_buffer.invalidate()
+
+def save_game(path: str):
+    snapshot.save(game, path)
+
+def load_game(path: str):
+    try:
+        state = snapshot.load(path)
+    except (OSError, ValueError, struct.error) as e:
+        print(f"Couldn't load {path}: {e}")
+        return
+    if len(state.players) != len(game.players):
+        print(f"Couldn't load {path}: it has {len(state.players)} players")
+        return
+    # Into the same GameState, everything else holds on to it
+    for name in engine.GameState.__slots__:
+        setattr(game, name, getattr(state, name))
+    game_log.restart(game)
+    rebuild_sprites()
+
+def playback_ready():
+    """The next logged move waits until the sprites have caught up with the engine."""
+    if anim_manager.anim_cards:
+        return False
+    # A four of a kind burns on the frame after its last card lands
+    return len(player1.hand.cards) == len(game.players[0].hand) and len(discard_pile.cards) == len(game.pile)
+
+if os.environ.get('PALACE_LOAD'):
+    load_game(os.environ['PALACE_LOAD'])
+    autosaved_turns = game.turns
+
+# Checked against the game as it will be played, after any PALACE_LOAD
+if playback is not None and not playback.starts_like(game):
+    print("Replay log wasn't dealt by this client, ignoring it")
+    playback = None
+
+# Where a recording starts, a fresh deal comes from the seed alone
+recording_start = snapshot.pack(game) if os.environ.get('PALACE_LOAD') else None
+
 # Game Loop
 running = True
 while running:
-    game_buffer = pygame.Surface(screen.get_size())
-    for event in pygame.event.get():
+    profiler.start()
+    events = scheduler.events(scene_busy())
+    profiler.mark('wait')
+
+    for event in events:
         if event.type == pygame.QUIT:
             running = False
         if event.type == pygame.KEYDOWN:
             if event.key == pygame.K_LSHIFT:
                 admin_commands = not admin_commands
+                profiler.enabled = admin_commands or bool(trace_path)
             if event.key == pygame.K_ESCAPE:
                 running = False
             elif event.key == PLAY:
-                match evaluate_hand(player1.hand.selections, discard_pile):
-                    case 0:
-                        player1.hand.start_shake(7, 12)
-                    case 1:
-                        player1.hand.play_cards(anim_manager, discard_pile)
-                    case 2:
-                        player1.hand.play_cards(anim_manager, discard_pile)
-                    case 3:
-                        player1.hand.play_cards(anim_manager, discard_pile)
-                    case 5:
-                        strength = discard_pile.cards[-1].strength if discard_pile.cards else 0
-                        for card in player1.hand.selections:
-                            card.strength = strength
-                        player1.hand.play_cards(anim_manager, discard_pile)
-                    case _:
-                        pass
+                play_selection()
+            elif event.key == SAVE:
+                save_game(save_path)
+            elif event.key == LOAD:
+                load_game(save_path)
             # Admin commands start
             elif admin_commands:
                 # Draw card
                 if event.key == pygame.K_s:
-                    x, y = player1.hand.anchor
-                    anim_manager.start_move(deck.get_card(player_hand, 1), player1.hand, deck.anchor, (x + 144, y), 13)
+                    draw_cards(1)
                 # Draw whole deck
                 elif event.key == pygame.K_a:
-                    x, y = player1.hand.anchor
-                    anim_manager.start_move(deck.get_card(player_hand, len(deck.current)), player1.hand, deck.anchor, (x + 144, y), 13)
+                    draw_cards(len(deck.current))
                 # Pick up discard pile
-                elif event.key == pygame.K_d:
-                    discard_pile.pickup(player_hand)
-                elif event.key == pygame.K_f:
-                    cards = []
-                    for card in discard_pile.cards:
-                        cards.append(card)
-                    anim_manager.start_move(cards, burn_pile, discard_pile.pos, burn_pile.pos, 13)
-                    discard_pile.cards = []
-                    discard_pile.rotations = []
-                    discard_pile.rot_cards = []
-                    screen_start_shake(40, 25)
+                elif event.key == pygame.K_d and not anim_manager.moving_to(discard_pile):
+                    pickup_pile()
+                elif event.key == pygame.K_f and not anim_manager.moving_to(discard_pile):
+                    burn_discards()
                 elif event.key == pygame.K_g:
-                    cards = []
-                    for card in player1.hand.cards:
-                        cards.append(card)
-                    anim_manager.start_move(cards, burn_pile, player1.hand.anchor, burn_pile.pos, 13)
-                    player1.hand.cards = []
-                    screen_start_shake(40, 25)
+                    burn_hand()
+                # Dump the profiler trace
+                elif event.key == pygame.K_p:
+                    profiler.export(trace_path or 'palace-trace.json')
             # Admin commands end
         elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+            pos = view.to_virtual(event.pos)
             for button in button_manager.buttons:
-                if button.is_clicked(event.pos):
+                if button.is_clicked(pos):
                     button.down = True
                     button.action()
-            selected_card = False
-            for card in list(reversed(player1.hand.cards)):
-                if selected_card:
-                    break
-                if card.selected:
-                    rect = card.front_surface.get_rect(topleft=(card.x, card.y - card.offset))
-                else:
-                    rect = card.front_surface.get_rect(topleft=(card.x, card.y))
-                if rect.collidepoint(event.pos):
-                    card.select(player1.hand, offset=50)
-                    selected_card = True
-            discard_pile.eval(player1.hand, event, anim_manager)
-            for card in player1.underhand.cards:
-                card_x, card_y = card.position
-                rect = card.back_surface.get_rect(topleft=(card_x, card_y))
-                if rect.collidepoint(event.pos):
-                    if len(deck.cards) <= 0 and len(player1.overhand.cards) <= 0 and len(player1.hand.cards) <= 0:
-                        player1.underhand.play_card(card, discard_pile, player1.hand, anim_manager, destroy_pile)
-                    else:
-                        player1.underhand.start_card_shake(card, 7, 12)
-            for card in player1.overhand.cards:
-                card_x, card_y = card.position
-                rect = card.front_surface.get_rect(topleft=(card_x, card_y))
-                if rect.collidepoint(event.pos):
-                    if len(deck.cards) <= 0 and len(player1.hand.cards) <= 0:
-                        player1.overhand.play_card(card, discard_pile, player1.hand, anim_manager, destroy_pile)
-                    else:
-                        player1.overhand.start_card_shake(card, 7, 12)
+            index_cards()
+            hits = hit_index.hits(pos)
+            if engine.HAND in hits:
+                hits[engine.HAND].select(player1.hand, offset=RAISE)
+            if engine.PILE in hits:
+                discard_pile.eval(player1.hand, anim_manager, game)
+            if engine.UNDER in hits:
+                play_underhand(hits[engine.UNDER])
+            if engine.OVER in hits:
+                play_overhand(hits[engine.OVER])
         elif event.type == pygame.MOUSEBUTTONUP and event.button == 1:
             for button in button_manager.buttons:
                 button.down = False
 
-    if discard_pile.cards and discard_pile.cards[-1].val == 9 or len(discard_pile.cards) >= 4 and discard_pile.cards[-1].val == discard_pile.cards[-2].val == discard_pile.cards[-3].val == discard_pile.cards[-4].val:
+    profiler.mark('events')
+
+    if playback is not None and playback_position < len(playback) and playback_ready():
+        now = pygame.time.get_ticks()
+        if now >= playback_due:
+            play_logged(playback.moves[playback_position])
+            playback_position += 1
+            playback_due = now + 1000 / playback_speed
+
+    # A computer player's move goes through the same paths as log playback
+    if player1.ai is not None and playback is None and game.winner is None and playback_ready():
+        move = player1.turn(game)
+        if move is not None:
+            play_logged(move)
+
+    if engine.is_burn([card.val for card in discard_pile.cards[-4:]]):
         anim_manager.start_move(discard_pile.cards, burn_pile, discard_pile.pos, burn_pile.pos, 13)
         discard_pile.cards = []
-        discard_pile.rotations = []
-        discard_pile.rot_cards = []
+        discard_pile.angles = []
         screen_start_shake(40, 25)
     
+    profiler.mark('rules')
+
     anim_manager.update_move(deck)
+    profiler.mark('update_move')
+
+    if autosave_path and game.turns != autosaved_turns:
+        save_game(autosave_path)
+        autosaved_turns = game.turns
 
     try:
         if len(player1.hand.cards) < player1.hand.min_hand_size and len(anim_manager.anim_cards) == 0:
@@ -825,27 +1097,27 @@ while running:
             anim_manager.start_move(deck.get_card(player1.hand, 1), player1.hand, deck.anchor, (px + 144, py), 13)
     except IndexError:
         pass
-    
-    if len(deck.cards) == 0:
-        if len(discard_pile.cards) >= 2:
-            if discard_pile.cards[-1].val < discard_pile.cards[-2].val and discard_pile.cards[-1].val not in POWER_LIST:
-                discard_pile.pickup(player1.hand)
-            elif discard_pile.cards[-1].val > discard_pile.cards[-2].val and discard_pile.cards[-1].val not in POWER_LIST and discard_pile.cards[-2].val == 6:
-                discard_pile.pickup(player1.hand)
-
-    game_buffer.fill(WHITE)
+    profiler.mark('refill')
 
     deck.draw_deck(game_buffer)
+    profiler.mark('deck')
 
     player1.draw(game_buffer)
+    profiler.mark('hand')
 
     discard_pile.draw_pile(game_buffer)
 
     burn_pile.draw_pile(game_buffer)
+    profiler.mark('piles')
 
     button_manager.draw_buttons(game_buffer)
 
     anim_manager.draw_cards(game_buffer)
+    profiler.mark('sprites')
+
+    if admin_commands:
+        profiler.draw(game_buffer)
+        profiler.mark('overlay')
 
     offset_x, offset_y = 0, 0
     if shake_active:
@@ -855,10 +1127,18 @@ while running:
         if shake_duration <= 0:
             shake_active = False
 
-    screen.blit(game_buffer, (offset_x, offset_y))
+    game_buffer.present(screen, (view.length(offset_x), view.length(offset_y)))
+    profiler.mark('present')
 
-    pygame.display.flip()
+    scheduler.tick()
+    profiler.mark('tick')
+    profiler.end()
+
+os.makedirs(os.path.dirname(log_path) or '.', exist_ok=True)
+game_log.save(log_path)
+if trace_path:
+    profiler.export(trace_path)
+if os.environ.get('PALACE_RECORD'):
+    harness.save(scheduler.recording(game_seed, screen.get_size(), recording_start), os.environ['PALACE_RECORD'])
 
-    clock.tick(FPS)
-    
 pygame.quit()
\ No newline at end of file
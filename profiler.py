@@ -0,0 +1,163 @@
+"""Frame phase timing, an on-screen overlay and Chrome trace export.
+
+The main loop calls start() once a frame, mark(phase) as each phase ends
+and end() at the bottom. Each mark is the time since the previous one, so
+phases tile the frame with nothing left over. While disabled all three
+return straight away.
+"""
+import json
+import time
+from array import array
+from collections import deque
+
+import pygame
+
+OVERLAY_BG = (0, 0, 0, 170)
+OVERLAY_FG = (255, 255, 255)
+
+def percentile_values(values: list, points: tuple) -> list:
+    """values at each percentile in points, nearest rank."""
+    values = sorted(values)
+    count = len(values)
+    if not count:
+        return [0] * len(points)
+    return [values[min(count - 1, count * point // 100)] for point in points]
+
+class FrameProfiler():
+    def __init__(self, window: int = 240, trace_frames: int = 1800, refresh: int = 15):
+        self.enabled = False
+        # Frames the percentiles are taken over
+        self.window = window
+        self.refresh = refresh
+
+        # phase -> ring of the last window durations in ns, in mark order
+        self.samples = {}
+        self.frames = 0
+        self.frame_start = 0
+        self.last = 0
+
+        # (phase, start, duration) per frame, the newest trace_frames frames
+        self.current = []
+        self.trace = deque(maxlen=trace_frames)
+        self.origin = time.perf_counter_ns()
+
+        self.font = None
+        self.overlay = None
+        self.overlay_frame = -1
+
+    def start(self):
+        if not self.enabled:
+            return
+        self.frame_start = self.last = time.perf_counter_ns()
+        self.current = []
+
+    def mark(self, phase: str):
+        if not self.enabled:
+            return
+        now = time.perf_counter_ns()
+        self.record(phase, self.last, now - self.last)
+        self.last = now
+
+    def end(self):
+        if not self.enabled or not self.frame_start:
+            return
+        now = time.perf_counter_ns()
+        self.record('frame', self.frame_start, now - self.frame_start)
+        self.trace.append(self.current)
+        self.frames += 1
+        self.frame_start = 0
+
+    def record(self, phase: str, start: int, duration: int):
+        ring = self.samples.get(phase)
+        if ring is None:
+            ring = self.samples[phase] = array('q', bytes(8 * self.window))
+        ring[self.frames % self.window] = duration
+        self.current.append((phase, start, duration))
+
+    def reset(self):
+        self.samples = {}
+        self.frames = 0
+        self.frame_start = 0
+        self.trace.clear()
+        self.overlay = None
+
+    # Stats
+    def percentiles(self, phase: str, points: tuple = (50, 95, 99)) -> list:
+        """Durations in ms at points over the last window frames."""
+        ring = self.samples.get(phase)
+        count = min(self.frames, self.window)
+        if ring is None or not count:
+            return [0.0] * len(points)
+        return [value / 1e6 for value in percentile_values(ring[:count], points)]
+
+    def stats(self) -> dict:
+        return {phase: dict(zip(('p50', 'p95', 'p99'), self.percentiles(phase))) for phase in self.samples}
+
+    def summary(self) -> dict:
+        """Per phase p50/p95/p99/mean/max in ms over every frame still in the trace."""
+        durations = {}
+        for frame in self.trace:
+            for phase, _, duration in frame:
+                durations.setdefault(phase, []).append(duration)
+        out = {}
+        for phase, values in durations.items():
+            p50, p95, p99 = percentile_values(values, (50, 95, 99))
+            out[phase] = {
+                'p50': p50 / 1e6,
+                'p95': p95 / 1e6,
+                'p99': p99 / 1e6,
+                'mean': sum(values) / len(values) / 1e6,
+                'max': max(values) / 1e6,
+            }
+        return out
+
+    # Overlay
+    def draw(self, screen, pos: tuple = (10, 10)):
+        """Blit the percentile table, rebuilt every refresh frames."""
+        if not self.enabled or not self.frames:
+            return
+        if self.overlay is None or self.frames - self.overlay_frame >= self.refresh:
+            self.overlay = self.build_overlay()
+            self.overlay_frame = self.frames
+        screen.blit(self.overlay, pos)
+
+    def build_overlay(self):
+        if self.font is None:
+            self.font = pygame.font.Font(None, 22)
+        lines = [f'{"ms":<12}{"p50":>7}{"p95":>7}{"p99":>7}']
+        for phase in self.samples:
+            p50, p95, p99 = self.percentiles(phase)
+            lines.append(f'{phase:<12}{p50:7.2f}{p95:7.2f}{p99:7.2f}')
+
+        rows = [self.font.render(line, True, OVERLAY_FG) for line in lines]
+        width = max(row.get_width() for row in rows) + 16
+        height = sum(row.get_height() for row in rows) + 12
+        surface = pygame.Surface((width, height), pygame.SRCALPHA)
+        surface.fill(OVERLAY_BG)
+        y = 6
+        for row in rows:
+            surface.blit(row, (8, y))
+            y += row.get_height()
+        return surface
+
+    # Trace
+    def trace_events(self) -> list:
+        """Chrome trace-event 'X' events for the kept frames, times in us."""
+        events = []
+        for frame in self.trace:
+            for phase, start, duration in frame:
+                events.append({
+                    'name': phase,
+                    'cat': 'frame' if phase == 'frame' else 'phase',
+                    'ph': 'X',
+                    'ts': (start - self.origin) / 1000,
+                    'dur': duration / 1000,
+                    'pid': 0,
+                    'tid': 0,
+                })
+        return events
+
+    def export(self, path: str):
+        """Write a trace that chrome://tracing and Perfetto can open."""
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': self.trace_events(), 'displayTimeUnit': 'ms'}, f)
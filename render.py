@@ -0,0 +1,228 @@
+import pygame
+
+from layout import Viewport, view
+
+WHITE = (255, 255, 255)
+
+def merge_rects(rects: list):
+    """Union overlapping rects until none of them overlap."""
+    merged = []
+    for rect in rects:
+        rect = pygame.Rect(rect)
+        i = 0
+        while i < len(merged):
+            if merged[i].colliderect(rect):
+                rect.union_ip(merged.pop(i))
+                i = 0
+            else:
+                i += 1
+        merged.append(rect)
+    return merged
+
+# Retained renderer
+class Renderer():
+    """
+    Stands in for the frame buffer. Draw code blits into it as usual, the
+    blits are recorded, and present() compares them with the last frame so
+    only the regions that changed are redrawn and pushed to the display.
+    Positions are virtual table coordinates, mapped through the viewport.
+    """
+    def __init__(self, size: tuple, background: tuple = WHITE, full_ratio: float = 0.5, viewport: Viewport = None):
+        self.view = viewport or view
+        self.buffer = pygame.Surface(size)
+        self.bounds = self.buffer.get_rect()
+        self.background = background
+
+        # Above this share of the screen a full redraw is cheaper
+        self.full_ratio = full_ratio
+
+        self.items = []
+        self.last = []
+        self.last_offset = (0, 0)
+        self.full = True
+
+        # Whether the last present() put anything new on screen
+        self.changed = True
+
+        self.frames = 0
+        self.full_frames = 0
+        self.partial_frames = 0
+        self.idle_frames = 0
+        self.dirty_pixels = 0
+
+    def get_size(self):
+        return self.buffer.get_size()
+
+    def blit(self, surface: pygame.Surface, pos: tuple):
+        rect = surface.get_rect(topleft=self.view.to_screen(pos))
+        self.items.append((surface, rect))
+        return rect
+
+    def invalidate(self):
+        self.full = True
+
+    def diff(self, old: list, new: list):
+        old_keys = [(surface, tuple(rect)) for surface, rect in old]
+        new_keys = [(surface, tuple(rect)) for surface, rect in new]
+        if old_keys == new_keys:
+            return []
+
+        old_set = set(old_keys)
+        new_set = set(new_keys)
+        changed = old_set ^ new_set
+        if not changed:
+            # Same sprites, new stacking order
+            changed = set()
+            for a, b in zip(old_keys, new_keys):
+                if a != b:
+                    changed.add(a)
+                    changed.add(b)
+
+        rects = []
+        for _, rect in changed:
+            rect = self.bounds.clip(pygame.Rect(rect))
+            if rect.width and rect.height:
+                rects.append(rect)
+        return merge_rects(rects)
+
+    def redraw(self, area: pygame.Rect = None):
+        buffer = self.buffer
+        if area is None:
+            buffer.fill(self.background)
+            for surface, rect in self.items:
+                buffer.blit(surface, rect)
+            return
+
+        buffer.set_clip(area)
+        buffer.fill(self.background, area)
+        for surface, rect in self.items:
+            if area.colliderect(rect):
+                buffer.blit(surface, rect)
+        buffer.set_clip(None)
+
+    def present(self, screen: pygame.Surface, offset: tuple = (0, 0)):
+        self.frames += 1
+        full = self.full or offset != (0, 0) or self.last_offset != (0, 0)
+
+        dirty = []
+        if not full:
+            dirty = self.diff(self.last, self.items)
+            area = sum(rect.width * rect.height for rect in dirty)
+            if area > self.bounds.width * self.bounds.height * self.full_ratio:
+                full = True
+
+        if full:
+            self.redraw()
+            screen.blit(self.buffer, offset)
+            pygame.display.flip()
+            self.full_frames += 1
+            self.dirty_pixels += self.bounds.width * self.bounds.height
+        elif dirty:
+            for rect in dirty:
+                self.redraw(rect)
+                screen.blit(self.buffer, rect, rect)
+            pygame.display.update(dirty)
+            self.partial_frames += 1
+            self.dirty_pixels += area
+        else:
+            self.idle_frames += 1
+
+        self.changed = full or bool(dirty)
+        self.last = self.items
+        self.items = []
+        self.last_offset = offset
+        self.full = False
+
+    def stats(self):
+        return {
+            'frames': self.frames,
+            'full': self.full_frames,
+            'partial': self.partial_frames,
+            'idle': self.idle_frames,
+            'dirty_pixels': self.dirty_pixels,
+        }
+
+# Pre-composited sprites
+def stack_surface(back: pygame.Surface, count: int):
+    """
+    (surface, top) of count card backs stacked as one blit each would
+    draw them, every back 0.5 higher and 1/6 further right than the last.
+    Blit it top virtual pixels above where the bottom card goes.
+    """
+    top = int((count - 1) * 0.5) + 1
+    width = back.get_width() + view.length(int((count - 1) * 0.5 / 3))
+    height = back.get_height() + view.length(top)
+    stack = pygame.Surface((width, height), pygame.SRCALPHA)
+    index = 0
+    for _ in range(count):
+        stack.blit(back, (view.length(int(index / 3)), view.length(top - index)))
+        index += 0.5
+    return stack, top
+
+def strip_surface(surfaces: list, spots: list):
+    """
+    (surface, virtual spot to blit it at) holding each surface blitted at
+    its virtual spot, bottom to top, the same pixels as a blit each.
+    """
+    left = min(x for x, _ in spots)
+    top = min(y for _, y in spots)
+    origin_x, origin_y = view.to_screen((left, top))
+    pixels = [view.to_screen(spot) for spot in spots]
+    width = max(x + surface.get_width() for surface, (x, _) in zip(surfaces, pixels)) - origin_x
+    height = max(y + surface.get_height() for surface, (_, y) in zip(surfaces, pixels)) - origin_y
+    strip = pygame.Surface((width, height), pygame.SRCALPHA)
+    for surface, (x, y) in zip(surfaces, pixels):
+        strip.blit(surface, (x - origin_x, y - origin_y))
+    return strip, (left, top)
+
+# Flattened pile
+class PileComposite():
+    """
+    Pile layers below the top few are baked into one surface, so drawing a
+    pile is one blit plus the live cards however tall it gets. New layers
+    are added as they settle, the surface is only rebuilt from scratch
+    when cards leave or the pile is replaced.
+    """
+    def __init__(self, live: int = 3, capacity: int = 64):
+        self.live = live
+        self.capacity = capacity
+        self.surface = None
+        self.top = 0
+
+        self.cards = None
+        self.settled = 0
+        self.rebuilds = 0
+
+    def rebuild(self, settled: int):
+        while self.capacity < settled:
+            self.capacity *= 2
+        # Room for the drift of every layer plus a card tilted either way
+        self.top = int(self.capacity * 0.1) + 1
+        size = (view.length(int(self.capacity / 3) + 240), view.length(self.top + 240))
+        self.surface = pygame.Surface(size, pygame.SRCALPHA)
+        self.settled = 0
+        self.rebuilds += 1
+
+    def update(self, cards: list, layer):
+        settled = max(len(cards) - self.live, 0)
+        if cards is not self.cards or settled < self.settled or settled > self.capacity:
+            self.cards = cards
+            self.rebuild(settled)
+        if settled == self.settled:
+            return
+
+        # A new surface so the renderer sees the change
+        self.surface = self.surface.copy()
+        while self.settled < settled:
+            i = self.settled
+            self.surface.blit(layer(i), (view.length(int(i / 3)), view.length(self.top - i * 0.1)))
+            self.settled += 1
+
+    def draw(self, screen, pos: tuple, cards: list, layer):
+        """layer(i) is the surface of the i-th card from the bottom."""
+        self.update(cards, layer)
+        x, y = pos
+        if self.settled:
+            screen.blit(self.surface, (x, y - self.top))
+        for i in range(self.settled, len(cards)):
+            screen.blit(layer(i), (x + int(i / 3), y - i * 0.1))
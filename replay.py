@@ -0,0 +1,156 @@
+"""Action logs and headless replay.
+
+A log is the seed, a snapshot of the game when logging started (the
+deal, for a new game) and every move handed to the engine after it, in
+order. apply_move is deterministic, so the moves rebuild the game
+exactly, with no pygame and no animation in the way.
+
+File layout, little-endian
+    header   4s magic, H version, Q seed
+    start    a snapshot.pack() of the starting state
+    moves    B kind, B zone, B count, b rank, B card count, card bytes
+"""
+import bisect
+import struct
+
+import engine
+import snapshot
+
+MAGIC = b'PALR'
+VERSION = 2
+
+HEADER = struct.Struct('<4sHQ')
+MOVE = struct.Struct('<BBBbB')
+
+class ActionLog():
+    def __init__(self, seed: int, state: engine.GameState):
+        self.seed = seed
+        self.restart(state)
+
+    def restart(self, state: engine.GameState):
+        """Log from state on, dropping the moves so far."""
+        # Packed, the game itself moves on
+        self.start = snapshot.pack(state)
+        self.moves = []
+
+    def __len__(self):
+        return len(self.moves)
+
+    def apply(self, state: engine.GameState, move: engine.Move) -> int:
+        """engine.apply_move, with the move logged."""
+        self.moves.append(move)
+        return engine.apply_move(state, move)
+
+    def to_bytes(self) -> bytes:
+        out = [HEADER.pack(MAGIC, VERSION, self.seed), self.start]
+        for move in self.moves:
+            out.append(MOVE.pack(move.kind, move.zone, move.count, move.rank, len(move.cards)))
+            out.append(bytes(move.cards))
+        return b''.join(out)
+
+    @classmethod
+    def from_bytes(cls, data: bytes):
+        magic, version, seed = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError('not a palace action log')
+        start, offset = snapshot.unpack_from(data, HEADER.size)
+        log = cls(seed, start)
+
+        while offset < len(data):
+            kind, zone, count, rank, n = MOVE.unpack_from(data, offset)
+            offset += MOVE.size
+            cards = tuple(data[offset:offset + n])
+            offset += n
+            log.moves.append(engine.Move(kind, zone, cards, count, rank))
+        return log
+
+    def save(self, path: str):
+        with open(path, 'wb') as f:
+            f.write(self.to_bytes())
+
+    def starts_like(self, state: engine.GameState) -> bool:
+        """Whether state is where this log starts from."""
+        return snapshot.pack(state) == self.start
+
+    def start_state(self) -> engine.GameState:
+        return snapshot.unpack(self.start)
+
+def load(path: str) -> ActionLog:
+    with open(path, 'rb') as f:
+        return ActionLog.from_bytes(f.read())
+
+class Replay():
+    """
+    Rebuilds the game after any number of logged moves. A snapshot is
+    kept every interval moves, so a jump only re-applies the moves since
+    the nearest one. The turn count at each snapshot is kept too, so a
+    jump to a turn can binary-search for its snapshot.
+    """
+    def __init__(self, log: ActionLog, interval: int = 64):
+        self.log = log
+        self.interval = interval
+        self.checkpoints = [log.start]
+        self.state = log.start_state()
+        self.checkpoint_turns = [self.state.turns]
+        self.position = 0
+
+    def __len__(self):
+        return len(self.log.moves)
+
+    def step(self) -> int:
+        """Apply the next move, returns its code."""
+        move = self.log.moves[self.position]
+        code = engine.apply_move(self.state, move)
+        self.position += 1
+        if self.position % self.interval == 0 and self.position // self.interval == len(self.checkpoints):
+            self.checkpoints.append(snapshot.pack(self.state))
+            self.checkpoint_turns.append(self.state.turns)
+        return code
+
+    def seek(self, position: int) -> engine.GameState:
+        """The state after the first position moves, without touching the log."""
+        position = max(0, min(position, len(self.log.moves)))
+        checkpoint = min(position // self.interval, len(self.checkpoints) - 1)
+        if position < self.position or checkpoint * self.interval > self.position:
+            self.state = snapshot.unpack(self.checkpoints[checkpoint])
+            self.position = checkpoint * self.interval
+        while self.position < position:
+            self.step()
+        return self.state
+
+    def seek_turn(self, turn: int) -> engine.GameState:
+        """The state once turn turns have been played, or the end of the log."""
+        # The last snapshot taken before turn, the first state at turn may come after it
+        checkpoint = max(0, bisect.bisect_left(self.checkpoint_turns, turn) - 1)
+        if self.state.turns >= turn or checkpoint * self.interval > self.position:
+            self.seek(checkpoint * self.interval)
+        while self.position < len(self.log.moves) and self.state.turns < turn:
+            self.step()
+        return self.state
+
+    def run(self) -> engine.GameState:
+        return self.seek(len(self.log.moves))
+
+def describe(state: engine.GameState) -> str:
+    lines = [f'turn {state.turns}, player {state.turn} to act, deck {len(state.deck)}, '
+             f'pile {len(state.pile)}, winner {state.winner}']
+    for i, p in enumerate(state.players):
+        lines.append(f'  player {i}: hand {sorted(p.hand)} over {list(p.over)} under {len(p.under)} cards')
+    return '\n'.join(lines)
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Rebuild a logged game headlessly')
+    parser.add_argument('log')
+    parser.add_argument('--turn', type=int, default=None, help='stop once this many turns are played')
+    args = parser.parse_args()
+
+    log = load(args.log)
+    game = Replay(log)
+    state = game.run() if args.turn is None else game.seek_turn(args.turn)
+    print(f'seed {log.seed}, {len(log)} moves logged, {game.position} replayed')
+    print(describe(state))
+
+if __name__ == '__main__':
+    main()
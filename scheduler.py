@@ -0,0 +1,53 @@
+import time
+
+import pygame
+
+# Frame scheduler
+class FrameScheduler():
+    """
+    Runs the loop at a fixed rate while something is moving and blocks on
+    the event queue when the scene is static, so an idle table costs no CPU.
+    """
+    def __init__(self, fps: int = 60, idle_timeout: int = 500):
+        self.fps = fps
+        # Milliseconds to block before waking up for one idle frame anyway
+        self.idle_timeout = idle_timeout
+        self.clock = pygame.time.Clock()
+
+        self.start_ns = time.perf_counter_ns()
+        self.idle_ns = 0
+        self.sleep_ns = 0
+        self.busy_frames = 0
+        self.idle_frames = 0
+
+    def events(self, busy: bool):
+        """This frame's events, waiting for the first one when not busy."""
+        if busy:
+            self.busy_frames += 1
+            return pygame.event.get()
+
+        self.idle_frames += 1
+        start = time.perf_counter_ns()
+        event = pygame.event.wait(self.idle_timeout)
+        self.idle_ns += time.perf_counter_ns() - start
+
+        events = pygame.event.get()
+        if event.type != pygame.NOEVENT:
+            events.insert(0, event)
+        return events
+
+    def tick(self):
+        start = time.perf_counter_ns()
+        self.clock.tick(self.fps)
+        self.sleep_ns += time.perf_counter_ns() - start
+
+    def stats(self):
+        total = max(time.perf_counter_ns() - self.start_ns, 1)
+        work = max(total - self.idle_ns - self.sleep_ns, 0)
+        return {
+            'busy_frames': self.busy_frames,
+            'idle_frames': self.idle_frames,
+            'idle_share': self.idle_ns / total,
+            'sleep_share': self.sleep_ns / total,
+            'render_share': work / total,
+        }
@@ -0,0 +1,90 @@
+"""Packed GameState snapshots.
+
+Cards are already byte-sized ids, so a whole game is a small header plus
+each zone's cards back to back, a few hundred bytes at most. A snapshot is
+an immutable bytes object: keeping one costs nothing more, any number of
+games can be restored from it and none of them can change it.
+
+Layout, little-endian
+    header   4s magic, H version, B players, B min hand size, B turn,
+             b winner (-1 for none), B strength, I turns, I pickups, I burns
+    zones    deck, pile, burned, then each player's hand, over, under and
+             known (hand cards the others have seen picked up), each a H
+             count and that many card bytes
+
+Version 1 snapshots had no known zone, they load with nothing known.
+"""
+import os
+import struct
+from array import array
+
+import engine
+
+MAGIC = b'PALS'
+VERSION = 2
+
+HEADER = struct.Struct('<4sHBBBbBIII')
+ZONE = struct.Struct('<H')
+
+def pack(state: engine.GameState) -> bytes:
+    winner = -1 if state.winner is None else state.winner
+    out = [HEADER.pack(MAGIC, VERSION, len(state.players), state.min_hand_size, state.turn, winner,
+                       state.strength, state.turns, state.pickups, state.burns)]
+    zones = [state.deck, state.pile, state.burned]
+    for p in state.players:
+        zones.extend((p.hand, p.over, p.under, p.known))
+    for zone in zones:
+        out.append(ZONE.pack(len(zone)))
+        out.append(zone.tobytes())
+    return b''.join(out)
+
+def unpack_from(data: bytes, offset: int = 0):
+    """(state, offset just past it), for snapshots embedded in other files."""
+    magic, version, players, min_hand_size, turn, winner, strength, turns, pickups, burns = \
+        HEADER.unpack_from(data, offset)
+    if magic != MAGIC or version not in (1, VERSION):
+        raise ValueError('not a palace snapshot')
+    offset += HEADER.size
+    per_player = 3 if version == 1 else 4
+
+    zones = []
+    for _ in range(3 + players * per_player):
+        (n,) = ZONE.unpack_from(data, offset)
+        offset += ZONE.size
+        zones.append(data[offset:offset + n])
+        offset += n
+
+    states = []
+    for i in range(players):
+        first = 3 + i * per_player
+        player = engine.PlayerState(*zones[first:first + 3])
+        if version > 1:
+            player.known = array('B', zones[first + 3])
+        states.append(player)
+    state = engine.GameState(zones[0], states, min_hand_size)
+    state.pile = array('B', zones[1])
+    state.burned = array('B', zones[2])
+    state.turn = turn
+    state.winner = None if winner < 0 else winner
+    state.strength = strength
+    state.turns = turns
+    state.pickups = pickups
+    state.burns = burns
+    return state, offset
+
+def unpack(data: bytes) -> engine.GameState:
+    return unpack_from(data)[0]
+
+def save(state: engine.GameState, path: str):
+    """Write a snapshot file, replacing any old one in a single step so a crash never leaves half a save."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temp = path + '.tmp'
+    with open(temp, 'wb') as f:
+        f.write(pack(state))
+    os.replace(temp, path)
+
+def load(path: str) -> engine.GameState:
+    with open(path, 'rb') as f:
+        return unpack(f.read())
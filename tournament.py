@@ -0,0 +1,117 @@
+"""Self-play tournaments on the headless engine, spread over processes.
+
+    python tournament.py --games 100000 --strategies greedy random
+"""
+import argparse
+import os
+import random
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import engine
+from bots import STRATEGIES
+
+# winner is -1 when the game hit max_turns, powers counts plays of each
+# POWER_LIST val in order
+GameResult = namedtuple('GameResult', ['seed', 'winner', 'turns', 'pickups', 'burns', 'powers'])
+
+Config = namedtuple('Config', ['strategies', 'decks', 'min_hand_size', 'max_turns'], defaults=[1, 4, 5000])
+
+def play_game(config: Config, seed: int) -> GameResult:
+    rng = random.Random(seed)
+    players = len(config.strategies)
+    state = engine.new_game(players, rng, config.min_hand_size, config.decks)
+    strategies = [STRATEGIES[name] for name in config.strategies]
+    powers = [0] * len(engine.POWER_LIST)
+
+    while state.winner is None and state.turns < config.max_turns:
+        move = strategies[state.turn](state, rng)
+        code = engine.apply_move(state, move)
+        if move.kind == engine.PLAY and code:
+            card = move.cards[0] if move.cards else move.rank * 4
+            val = engine.CARD_VALS[card]
+            if val in engine.POWER_LIST:
+                powers[engine.POWER_LIST.index(val)] += 1
+
+    winner = -1 if state.winner is None else state.winner
+    return GameResult(seed, winner, state.turns, state.pickups, state.burns, tuple(powers))
+
+def run_batch(config: Config, seeds: range) -> list:
+    """One worker's share, played back to back in this process."""
+    return [play_game(config, seed) for seed in seeds]
+
+def batches(games: int, batch_size: int, seed: int):
+    for start in range(0, games, batch_size):
+        yield range(seed + start, seed + min(start + batch_size, games))
+
+def run_tournament(config: Config, games: int, workers: int = None, batch_size: int = 500, seed: int = 0) -> list:
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        results = []
+        for seeds in batches(games, batch_size, seed):
+            results.extend(run_batch(config, seeds))
+        return results
+
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(run_batch, config, seeds) for seeds in batches(games, batch_size, seed)]
+        for future in futures:
+            results.extend(future.result())
+    return results
+
+def summarize(config: Config, results: list) -> dict:
+    games = len(results)
+    wins = [0] * len(config.strategies)
+    unfinished = 0
+    powers = [0] * len(engine.POWER_LIST)
+    for result in results:
+        if result.winner < 0:
+            unfinished += 1
+        else:
+            wins[result.winner] += 1
+        for i, count in enumerate(result.powers):
+            powers[i] += count
+
+    summary = {
+        'games': games,
+        'unfinished': unfinished,
+        'mean_turns': sum(result.turns for result in results) / games,
+        'mean_pickups': sum(result.pickups for result in results) / games,
+        'mean_burns': sum(result.burns for result in results) / games,
+    }
+    for seat, name in enumerate(config.strategies):
+        summary[f'seat{seat}_{name}_win_rate'] = wins[seat] / games
+    names = {engine.TWO: '2', engine.SEVEN: '7', engine.EIGHT: '8', engine.TEN: '10'}
+    for val, count in zip(engine.POWER_LIST, powers):
+        summary[f'plays_of_{names[val]}_per_game'] = count / games
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description='Palace self-play tournament')
+    parser.add_argument('--games', type=int, default=10000)
+    parser.add_argument('--strategies', nargs='+', default=['greedy', 'random'], choices=sorted(STRATEGIES))
+    parser.add_argument('--decks', type=int, default=1)
+    parser.add_argument('--min-hand-size', type=int, default=4)
+    parser.add_argument('--max-turns', type=int, default=5000)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    config = Config(tuple(args.strategies), args.decks, args.min_hand_size, args.max_turns)
+    start = time.perf_counter()
+    results = run_tournament(config, args.games, args.workers, args.batch_size, args.seed)
+    elapsed = time.perf_counter() - start
+
+    summary = summarize(config, results)
+    summary['seconds'] = elapsed
+    summary['games_per_second'] = len(results) / elapsed
+    for key, value in summary.items():
+        if isinstance(value, float):
+            print(f'{key}: {value:.3f}')
+        else:
+            print(f'{key}: {value}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""Array-backed tweens, no pygame.
+
+Every active tween lives at the same index in a set of parallel arrays, so
+one pass over them steps all moves, and finished tweens are compacted out
+in the same pass.
+"""
+from array import array
+
+# Easing curves, progress 0..1 in and out
+def linear(t: float) -> float:
+    return t
+
+def ease_in(t: float) -> float:
+    return t * t
+
+def ease_out(t: float) -> float:
+    return t * (2 - t)
+
+def ease_in_out(t: float) -> float:
+    return t * t * (3 - 2 * t)
+
+LINEAR = 0
+EASE_IN = 1
+EASE_OUT = 2
+EASE_IN_OUT = 3
+
+EASINGS = [linear, ease_in, ease_out, ease_in_out]
+
+class TweenEngine():
+    def __init__(self):
+        self.start_x = array('d')
+        self.start_y = array('d')
+        self.end_x = array('d')
+        self.end_y = array('d')
+        self.x = array('d')
+        self.y = array('d')
+        self.tick = array('l')
+        self.duration = array('l')
+        self.ease = array('B')
+
+        # Whatever is being moved and where it goes once it arrives
+        self.items = []
+        self.targets = []
+
+    def __len__(self):
+        return len(self.items)
+
+    def add(self, item, target, start: tuple, end: tuple, duration: int, ease: int = LINEAR):
+        self.start_x.append(start[0])
+        self.start_y.append(start[1])
+        self.end_x.append(end[0])
+        self.end_y.append(end[1])
+        self.x.append(start[0])
+        self.y.append(start[1])
+        self.tick.append(0)
+        self.duration.append(duration)
+        self.ease.append(ease)
+        self.items.append(item)
+        self.targets.append(target)
+
+    def step(self) -> list:
+        """
+        Advance every tween one frame. Tweens that were already at their
+        end are removed and returned as (item, target, end_pos), in the
+        order they were added.
+        """
+        finished = []
+        start_x, start_y = self.start_x, self.start_y
+        end_x, end_y = self.end_x, self.end_y
+        x, y = self.x, self.y
+        tick, duration, ease = self.tick, self.duration, self.ease
+        items, targets = self.items, self.targets
+
+        keep = 0
+        for i in range(len(items)):
+            t = tick[i]
+            d = duration[i]
+            if t >= d:
+                finished.append((items[i], targets[i], (end_x[i], end_y[i])))
+                continue
+
+            e = ease[i]
+            p = t / d if e == LINEAR else EASINGS[e](t / d)
+            sx = start_x[i]
+            sy = start_y[i]
+
+            if keep != i:
+                start_x[keep] = sx
+                start_y[keep] = sy
+                end_x[keep] = end_x[i]
+                end_y[keep] = end_y[i]
+                duration[keep] = d
+                ease[keep] = e
+                items[keep] = items[i]
+                targets[keep] = targets[i]
+
+            x[keep] = sx + (end_x[keep] - sx) * p
+            y[keep] = sy + (end_y[keep] - sy) * p
+            tick[keep] = t + 1
+            keep += 1
+
+        if keep != len(items):
+            for buffer in (start_x, start_y, end_x, end_y, x, y, tick, duration, ease):
+                del buffer[keep:]
+            del items[keep:]
+            del targets[keep:]
+        return finished
+
+    def clear(self):
+        for buffer in (self.start_x, self.start_y, self.end_x, self.end_y, self.x, self.y, self.tick, self.duration, self.ease):
+            del buffer[:]
+        self.items.clear()
+        self.targets.clear()
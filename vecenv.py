@@ -0,0 +1,266 @@
+"""Many headless games stepped at once with NumPy, for training agents.
+
+Every game is rank counts, suits never matter to the rules, held in
+struct-of-arrays form so one step() call plays a move in all of them.
+Plays are scored with batch.evaluate_batch, so they follow the same rules
+as evaluate_hand, and a pile burns on a 10 or four of a kind as in the
+main loop.
+
+Whoever is to act in a game takes its action, observations are from their
+side of the table and rewards are theirs, +1 for the move that wins. A
+finished game is dealt again before step() returns.
+
+Actions, for a shoe of D decks (C = 4 * D copies of a rank)
+    rank * C + count - 1    play count cards of rank, one at a time from the overhand
+    PICKUP                  pick up the pile, legal only when nothing can be played
+    BLIND                   turn over an underhand card at random and play it
+
+Observation, one float32 row per game
+    13 own hand counts, 13 own overhand counts, 13 pile counts
+    per other player in turn order: 13 overhand counts, hand size, underhand size
+    own underhand size, deck size, top strength (0 empty), top val, top run
+"""
+import numpy as np
+
+import engine
+from batch import evaluate_batch
+
+HAND = engine.HAND
+OVER = engine.OVER
+UNDER = engine.UNDER
+RANKS = engine.RANKS
+
+VAL_TABLE = np.array(engine.VALS, dtype=np.int16)
+# PLAYABLE_TABLE[strength, rank], strength 0 is an empty pile
+PLAYABLE_TABLE = np.array([[mask >> rank & 1 for rank in range(RANKS)] for mask in engine.PLAYABLE], dtype=bool)
+
+class PalaceVecEnv():
+    def __init__(self, num_envs: int = 1024, players: int = 2, min_hand_size: int = 4, decks: int = 1,
+                 max_turns: int = 1000, illegal_reward: float = -0.1, seed: int = None):
+        self.num_envs = num_envs
+        self.players = players
+        self.min_hand_size = min_hand_size
+        self.decks = decks
+        self.copies = 4 * decks
+        self.max_turns = max_turns
+        self.illegal_reward = illegal_reward
+        self.rng = np.random.default_rng(seed)
+
+        self.PICKUP = RANKS * self.copies
+        self.BLIND = self.PICKUP + 1
+        self.action_size = self.BLIND + 1
+        self.observation_size = 3 * RANKS + (players - 1) * (RANKS + 2) + 5
+
+        n = num_envs
+        self.rows = np.arange(n)
+        # Zone counts, [game, player, rank]
+        self.hand = np.zeros((n, players, RANKS), dtype=np.int16)
+        self.over = np.zeros((n, players, RANKS), dtype=np.int16)
+        self.under = np.zeros((n, players, RANKS), dtype=np.int16)
+
+        self.pile = np.zeros((n, RANKS), dtype=np.int16)
+        self.pile_size = np.zeros(n, dtype=np.int16)
+        # Top strength (an 8 keeps the one it copied), val and how many of
+        # that val are stacked on top, all 0 on an empty pile
+        self.strength = np.zeros(n, dtype=np.int16)
+        self.top_val = np.zeros(n, dtype=np.int16)
+        self.run = np.zeros(n, dtype=np.int16)
+
+        # Ranks in draw order, cards are drawn from deck_size - 1 down
+        self.deck = np.zeros((n, engine.CARDS * decks), dtype=np.int16)
+        self.deck_size = np.zeros(n, dtype=np.int16)
+
+        self.turn = np.zeros(n, dtype=np.int64)
+        self.turns = np.zeros(n, dtype=np.int32)
+
+        self.steps = 0
+        self.games = 0
+
+    # Dealing
+    def draw(self, rows: np.ndarray, players: np.ndarray, zone: np.ndarray, want: np.ndarray):
+        """Draw up to want cards per row from the end of its deck into zone."""
+        want = np.minimum(want, self.deck_size[rows])
+        for k in range(int(want.max(initial=0))):
+            take = want > k
+            r = rows[take]
+            self.deck_size[r] -= 1
+            ranks = self.deck[r, self.deck_size[r]]
+            zone[r, players[take], ranks] += 1
+
+    def refill(self, rows: np.ndarray, players: np.ndarray):
+        want = self.min_hand_size - self.hand[rows, players].sum(axis=1)
+        self.draw(rows, players, self.hand, np.maximum(want, 0))
+
+    def deal(self, rows: np.ndarray):
+        """Shuffle a fresh shoe for each of rows and deal as engine.new_game does."""
+        k = len(rows)
+        if not k:
+            return
+        for zone in (self.hand, self.over, self.under):
+            zone[rows] = 0
+        self.pile[rows] = 0
+        self.pile_size[rows] = 0
+        self.strength[rows] = 0
+        self.top_val[rows] = 0
+        self.run[rows] = 0
+        self.turn[rows] = 0
+        self.turns[rows] = 0
+
+        cards = self.rng.random((k, self.deck.shape[1])).argsort(axis=1)
+        self.deck[rows] = (cards % engine.CARDS) >> 2
+        self.deck_size[rows] = self.deck.shape[1]
+
+        three = np.full(k, 3)
+        for player in range(self.players):
+            seats = np.full(k, player)
+            self.draw(rows, seats, self.under, three)
+            self.draw(rows, seats, self.over, three)
+        for player in range(self.players):
+            self.refill(rows, np.full(k, player))
+        self.games += k
+
+    def reset(self) -> np.ndarray:
+        self.deal(self.rows)
+        return self.observe()
+
+    # Rules
+    def active_zone(self) -> np.ndarray:
+        """Per game, HAND while the hand or deck has cards, then OVER, then UNDER."""
+        rows, turn = self.rows, self.turn
+        hand = self.hand[rows, turn].sum(axis=1)
+        over = self.over[rows, turn].sum(axis=1)
+        return np.where((hand > 0) | (self.deck_size > 0), HAND, np.where(over > 0, OVER, UNDER))
+
+    def action_masks(self) -> np.ndarray:
+        """[game, action] bool, the moves engine.legal_moves would offer."""
+        rows, turn = self.rows, self.turn
+        zone = self.active_zone()
+        playable = PLAYABLE_TABLE[self.strength]
+        hand = self.hand[rows, turn]
+        over = self.over[rows, turn]
+
+        counts = np.arange(1, self.copies + 1)
+        hand_plays = (hand[:, :, None] >= counts) & playable[:, :, None] & (zone == HAND)[:, None, None]
+        over_plays = np.zeros_like(hand_plays)
+        over_plays[:, :, 0] = (over > 0) & playable & (zone == OVER)[:, None]
+
+        masks = np.zeros((self.num_envs, self.action_size), dtype=bool)
+        masks[:, :self.PICKUP] = (hand_plays | over_plays).reshape(self.num_envs, -1)
+        masks[:, self.BLIND] = (zone == UNDER) & (self.under[rows, turn].sum(axis=1) > 0)
+        masks[:, self.PICKUP] = (self.pile_size > 0) & ~masks.any(axis=1)
+        return masks
+
+    def pickup(self, rows: np.ndarray):
+        self.hand[rows, self.turn[rows]] += self.pile[rows]
+        self.clear_pile(rows)
+
+    def clear_pile(self, rows: np.ndarray):
+        self.pile[rows] = 0
+        self.pile_size[rows] = 0
+        self.strength[rows] = 0
+        self.top_val[rows] = 0
+        self.run[rows] = 0
+
+    def step(self, actions):
+        """
+        Apply one action per game. Returns (observations, rewards, dones,
+        info), info holds the 'illegal' and 'truncated' masks. An illegal
+        action leaves its game untouched and scores illegal_reward.
+        """
+        actions = np.asarray(actions, dtype=np.int64)
+        rows, turn = self.rows, self.turn
+        legal = self.action_masks()[rows, actions]
+
+        rank = np.minimum(actions // self.copies, RANKS - 1)
+        count = actions % self.copies + 1
+        zone = self.active_zone()
+
+        # Blind plays take a random underhand card
+        blind = legal & (actions == self.BLIND)
+        if blind.any():
+            r = rows[blind]
+            under = self.under[r, turn[r]]
+            total = under.sum(axis=1)
+            pick = self.rng.integers(0, total)
+            rank[r] = (under.cumsum(axis=1) > pick[:, None]).argmax(axis=1)
+            count[r] = 1
+
+        # Take the cards out of their zone
+        play = legal & (actions < self.PICKUP) | blind
+        for z, cards in ((HAND, self.hand), (OVER, self.over), (UNDER, self.under)):
+            r = rows[play & (zone == z)]
+            cards[r, turn[r], rank[r]] -= count[r]
+
+        val = VAL_TABLE[rank]
+        fails = blind & ~PLAYABLE_TABLE[self.strength, rank]
+        plays = play & ~fails
+
+        # A blind card that can't go is picked up with the pile
+        r = rows[fails]
+        self.pile[r, rank[r]] += 1
+        pickups = fails | legal & (actions == self.PICKUP)
+
+        r = rows[plays]
+        codes = evaluate_batch(val[r], self.strength[r])
+        empty = self.pile_size[r] == 0
+        self.pile[r, rank[r]] += count[r]
+        self.pile_size[r] += count[r]
+        self.strength[r] = np.where(codes == 5, self.strength[r], val[r])
+        self.run[r] = np.where((self.top_val[r] == val[r]) & ~empty, self.run[r] + count[r], count[r])
+        self.top_val[r] = val[r]
+
+        burns = np.zeros(self.num_envs, dtype=bool)
+        burns[r] = (val[r] == engine.TEN) | (self.run[r] >= 4)
+        again = burns.copy()
+        again[r] |= codes == 2
+        self.clear_pile(rows[burns])
+
+        self.pickup(rows[pickups])
+
+        # End of turn, as engine.end_turn
+        r = rows[legal]
+        self.refill(r, turn[r])
+        left = self.hand[rows, turn].sum(axis=1) + self.over[rows, turn].sum(axis=1) + self.under[rows, turn].sum(axis=1)
+        wins = legal & (left == 0) & (self.deck_size == 0)
+        self.turn = np.where(legal & ~again & ~wins, (turn + 1) % self.players, turn)
+
+        rewards = np.where(wins, 1.0, np.where(legal, 0.0, self.illegal_reward)).astype(np.float32)
+        self.turns += 1
+        truncated = ~wins & (self.turns >= self.max_turns)
+        dones = wins | truncated
+        self.deal(rows[dones])
+        self.steps += self.num_envs
+
+        info = {'illegal': ~legal, 'truncated': truncated}
+        return self.observe(), rewards, dones, info
+
+    # Observation
+    def observe(self) -> np.ndarray:
+        rows, turn = self.rows, self.turn
+        obs = np.empty((self.num_envs, self.observation_size), dtype=np.float32)
+        obs[:, 0:RANKS] = self.hand[rows, turn]
+        obs[:, RANKS:2 * RANKS] = self.over[rows, turn]
+        obs[:, 2 * RANKS:3 * RANKS] = self.pile
+
+        i = 3 * RANKS
+        for seat in range(1, self.players):
+            other = (turn + seat) % self.players
+            obs[:, i:i + RANKS] = self.over[rows, other]
+            obs[:, i + RANKS] = self.hand[rows, other].sum(axis=1)
+            obs[:, i + RANKS + 1] = self.under[rows, other].sum(axis=1)
+            i += RANKS + 2
+
+        obs[:, i] = self.under[rows, turn].sum(axis=1)
+        obs[:, i + 1] = self.deck_size
+        obs[:, i + 2] = self.strength
+        obs[:, i + 3] = self.top_val
+        obs[:, i + 4] = self.run
+        return obs
+
+    def sample_actions(self, masks: np.ndarray = None) -> np.ndarray:
+        """A uniformly random legal action per game."""
+        if masks is None:
+            masks = self.action_masks()
+        scores = self.rng.random(masks.shape)
+        scores[~masks] = -1.0
+        return scores.argmax(axis=1)